@@ -1,104 +1,166 @@
-"""
-Ozon XML Duplicate Checker
-Утилита для проверки дубликатов SKU в XML-файлах с результатами парсинга.
-"""
-
-import xml.etree.ElementTree as ET
-from collections import Counter
-import glob
-import os
-import sys
-
-
-def find_duplicate_skus(xml_file):
-    """
-    Проверяет XML-файл на наличие дубликатов SKU.
-
-    Args:
-        xml_file: Путь к XML-файлу
-
-    Returns:
-        Кортеж (total, duplicates):
-        - total: Общее количество артикулов
-        - duplicates: Словарь {sku: count} с дубликатами
-    """
-    try:
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-
-        # Собираем все SKU
-        skus = []
-        for item in root.findall("item"):
-            sku_elem = item.find("sku")
-            if sku_elem is not None and sku_elem.text:
-                skus.append(sku_elem.text)
-
-        total = len(skus)
-        counter = Counter(skus)
-        duplicates = {sku: count for sku, count in counter.items() if count > 1}
-
-        return total, duplicates
-
-    except ET.ParseError as e:
-        print(f"Ошибка парсинга XML-файла {xml_file}: {e}")
-        return 0, {}
-    except Exception as e:
-        print(f"Ошибка обработки файла {xml_file}: {e}")
-        return 0, {}
-
-
-def print_results(xml_file, total, duplicates):
-    """
-    Выводит результаты проверки на дубликаты.
-
-    Args:
-        xml_file: Путь к XML-файлу
-        total: Общее количество артикулов
-        duplicates: Словарь с дубликатами
-    """
-    print(f"\n{'=' * 60}")
-    print(f"Файл: {os.path.basename(xml_file)}")
-    print(f"{'=' * 60}")
-    print(f"Проверено артикулов: {total}")
-
-    if duplicates:
-        print(f"\n⚠️  Найдены дубли артикулов:")
-        for sku, count in sorted(duplicates.items()):
-            print(f"  • Артикул {sku} встречается {count} раз(а)")
-        print(f"\nВсего уникальных дублей: {len(duplicates)}")
-        print(f"Всего дублирующихся записей: {sum(duplicates.values())}")
-    else:
-        print("\n✓ Дублей артикулов не найдено.")
-
-
-def main():
-    """Главная функция программы"""
-    print("Ozon XML Duplicate Checker")
-    print("=" * 60)
-
-    # Ищем все XML-файлы, начинающиеся на seller_
-    xml_files = glob.glob("seller_*.xml")
-
-    if not xml_files:
-        print("\nXML-файлы формата 'seller_*.xml' не найдены в текущей директории.")
-        print("Убедитесь, что вы запускаете скрипт из директории с XML-файлами.")
-        sys.exit(1)
-
-    print(f"\nНайдено файлов для проверки: {len(xml_files)}")
-
-    # Обрабатываем каждый файл
-    total_duplicates = 0
-    for xml_file in sorted(xml_files):
-        total, duplicates = find_duplicate_skus(xml_file)
-        print_results(xml_file, total, duplicates)
-        total_duplicates += len(duplicates)
-
-    # Итоговая статистика
-    print(f"\n{'=' * 60}")
-    print(f"Итого обработано файлов: {len(xml_files)}")
-    print(f"Итого найдено уникальных дублей: {total_duplicates}")
-    print(f"{'=' * 60}\n")
-
-
-if __name__ == "__main__":
-    main()
+"""
+Ozon XML Duplicate Checker
+Утилита для проверки дубликатов SKU в XML-файлах с результатами парсинга.
+"""
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import io
+import os
+import sys
+
+try:
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:
+    import xml.etree.ElementTree as etree
+    HAS_LXML = False
+
+
+def _iter_skus(xml_file):
+    """
+    Потоково извлекает SKU из XML-файла.
+
+    Каждый <item> очищается и отцепляется от корня сразу после чтения,
+    поэтому расход памяти не зависит от количества товаров в файле.
+
+    Args:
+        xml_file: Путь к XML-файлу
+
+    Yields:
+        Текст элемента <sku> для каждого товара
+    """
+    if HAS_LXML:
+        for _, elem in etree.iterparse(xml_file, events=("end",), tag="item"):
+            sku = elem.findtext("sku")
+            if sku:
+                yield sku
+            elem.clear()
+            # Удаляем уже обработанные <item> из родителя
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        return
+
+    root = None
+    for event, elem in etree.iterparse(xml_file, events=("start", "end")):
+        if root is None:
+            root = elem  # Первое событие - начало корневого элемента
+            continue
+        if event == "end" and elem.tag == "item":
+            sku = elem.findtext("sku")
+            if sku:
+                yield sku
+            root.clear()
+
+
+def find_duplicate_skus(xml_file):
+    """
+    Проверяет XML-файл на наличие дубликатов SKU.
+
+    Args:
+        xml_file: Путь к XML-файлу
+
+    Returns:
+        Кортеж (total, duplicates):
+        - total: Общее количество артикулов
+        - duplicates: Словарь {sku: count} с дубликатами
+    """
+    try:
+        # Считаем SKU сразу из генератора, без промежуточного списка
+        counter = Counter(_iter_skus(xml_file))
+        total = sum(counter.values())
+        duplicates = {sku: count for sku, count in counter.items() if count > 1}
+
+        return total, duplicates
+
+    except etree.ParseError as e:
+        print(f"Ошибка парсинга XML-файла {xml_file}: {e}")
+        return 0, {}
+    except Exception as e:
+        print(f"Ошибка обработки файла {xml_file}: {e}")
+        return 0, {}
+
+
+def _scan_file(xml_file):
+    """
+    Проверяет файл в дочернем процессе.
+
+    Сообщения об ошибках перехватываются и возвращаются вместе с результатом,
+    чтобы основной процесс вывел их по порядку, а не вперемешку с отчетами.
+
+    Args:
+        xml_file: Путь к XML-файлу
+
+    Returns:
+        Кортеж (total, duplicates, output)
+    """
+    output = io.StringIO()
+    with redirect_stdout(output):
+        total, duplicates = find_duplicate_skus(xml_file)
+    return total, duplicates, output.getvalue()
+
+
+def print_results(xml_file, total, duplicates):
+    """
+    Выводит результаты проверки на дубликаты.
+
+    Args:
+        xml_file: Путь к XML-файлу
+        total: Общее количество артикулов
+        duplicates: Словарь с дубликатами
+    """
+    print(f"\n{'=' * 60}")
+    print(f"Файл: {os.path.basename(xml_file)}")
+    print(f"{'=' * 60}")
+    print(f"Проверено артикулов: {total}")
+
+    if duplicates:
+        print(f"\n⚠️  Найдены дубли артикулов:")
+        for sku, count in sorted(duplicates.items()):
+            print(f"  • Артикул {sku} встречается {count} раз(а)")
+        print(f"\nВсего уникальных дублей: {len(duplicates)}")
+        print(f"Всего дублирующихся записей: {sum(duplicates.values())}")
+    else:
+        print("\n✓ Дублей артикулов не найдено.")
+
+
+def main():
+    """Главная функция программы"""
+    print("Ozon XML Duplicate Checker")
+    print("=" * 60)
+
+    # Ищем все XML-файлы, начинающиеся на seller_
+    with os.scandir(".") as entries:
+        xml_files = [
+            entry.name for entry in entries
+            if entry.name.startswith("seller_") and entry.name.endswith(".xml") and entry.is_file()
+        ]
+
+    if not xml_files:
+        print("\nXML-файлы формата 'seller_*.xml' не найдены в текущей директории.")
+        print("Убедитесь, что вы запускаете скрипт из директории с XML-файлами.")
+        sys.exit(1)
+
+    print(f"\nНайдено файлов для проверки: {len(xml_files)}")
+
+    # Файлы независимы - разбираем их параллельно в отдельных процессах,
+    # результаты выводим в исходном (отсортированном) порядке
+    xml_files.sort()
+    total_duplicates = 0
+    workers = min(len(xml_files), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for xml_file, (total, duplicates, output) in zip(xml_files, executor.map(_scan_file, xml_files)):
+            print(output, end="")
+            print_results(xml_file, total, duplicates)
+            total_duplicates += len(duplicates)
+
+    # Итоговая статистика
+    print(f"\n{'=' * 60}")
+    print(f"Итого обработано файлов: {len(xml_files)}")
+    print(f"Итого найдено уникальных дублей: {total_duplicates}")
+    print(f"{'=' * 60}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,15 @@ Ozon HTML Parser
 import re
 import json
 from pathlib import Path
-from xml.etree import ElementTree as ET
+from xml.sax.saxutils import escape
 import datetime
 import os
+import mmap
 import shutil
 import logging
+from bisect import bisect_left
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
 
 try:
     from bs4 import BeautifulSoup
@@ -19,6 +23,21 @@ try:
 except ImportError:
     HAS_BS4 = False
 
+# lxml (C-парсер libxml2) заметно быстрее встроенного html.parser
+try:
+    import lxml  # noqa: F401
+    BS4_PARSER = 'lxml'
+except ImportError:
+    BS4_PARSER = 'html.parser'
+
+# re2 для горячих регулярок через общий модуль пакета src, если он доступен
+# (скрипт запущен с корнем репозитория в sys.path), иначе стандартный re
+try:
+    from src.utils.fast_regex import compile_fast
+except ImportError:
+    compile_fast = re.compile
+
+
 # ==================== КОНСТАНТЫ ====================
 CONFIG_FILE = 'config.json'
 LOG_FILE = 'parser.log'
@@ -26,16 +45,39 @@ OUTPUT_LOG_FILE = 'parse_log.jsonl'
 ARCHIVE_DIR = 'archive'
 
 # Регулярные выражения для парсинга
-RE_PRODUCT_ID = re.compile(
+# Горячие шаблоны (сканируют весь HTML) компилируются через compile_fast.
+# В RE_PRICE пробелы заданы самими символами, а не escape-последовательностями \u,
+# которые не понимает синтаксис re2.
+RE_PRODUCT_ID = compile_fast(
     r'/product/[^\"\'>]*-(\d+)|ozon\.ru/product/[^\"\'>]*-(\d+)', re.IGNORECASE
 )
-RE_PRICE = re.compile(r'[\d\u00A0\u2009\u202F]+(?:\u2009| )?₽')
-RE_SKU = re.compile(r'\"sku\"\s*:\s*(\d+)')
+RE_PRICE = compile_fast('[\\d\u00A0\u2009\u202F]+(?:\u2009| )?₽')
+# Хвост ссылки на товар, проверяется в позициях, найденных по RE_PRODUCT_MARKER.
+# Маркер ищется без учета регистра, как и в RE_PRODUCT_ID.
+# Только стандартный re: re2 на каждый match(text, pos) заново перекодирует
+# всю строку в UTF-8, и проверка в каждой позиции стала бы квадратичной
+RE_PRODUCT_LINK_TAIL = re.compile(r'/product/[^\"\'>]*-(\d+)', re.IGNORECASE)
+RE_PRODUCT_MARKER = re.compile(r'/product/', re.IGNORECASE)
+RE_SKU = compile_fast(r'\"sku\"\s*:\s*(\d+)')
 RE_SELLER_ID = re.compile(r'seller_(\d+)')
+# \s в Unicode-режиме уже покрывает неразрывные и тонкие пробелы
+RE_WHITESPACE = re.compile(r'[\s\u00A0\u2009\u202F]+')
+
+# CSS-классы карточек товаров для BeautifulSoup
+RE_CARD_CLASS = re.compile(r'card|tile|product', re.IGNORECASE)
+# Название товара в fallback-режиме, в порядке приоритета:
+# атрибуты alt, title, aria-label, затем текстовый узел
+RE_NAME_PATTERNS = (
+    re.compile(r'alt=\"([^\"]{5,300}?)(?:\"|>)'),
+    re.compile(r'title=\"([^\"]{5,300}?)(?:\"|>)'),
+    re.compile(r'aria-label=\"([^\"]{5,300}?)(?:\"|>)'),
+    re.compile(r'>([^<]{10,400}?)<'),
+)
 
 # Параметры парсинга
 SEARCH_WINDOW_SIZE = 4000  # Размер окна поиска вокруг найденного товара
 MAX_PRICES_PER_ITEM = 2    # Максимальное количество цен на товар
+HTML_SUFFIXES = ('.html', '.htm')  # Расширения обрабатываемых HTML-файлов
 
 def clean_text(s: str) -> str:
     """
@@ -49,10 +91,38 @@ def clean_text(s: str) -> str:
     """
     if not s:
         return ''
-    s = s.strip()
-    s = re.sub(r'[\u00A0\u2009\u202F]+', ' ', s)  # Заменяем неразрывные пробелы
-    s = re.sub(r'\s+', ' ', s)  # Заменяем множественные пробелы одним
-    return s
+    # Один проход: любые пробельные последовательности (включая неразрывные) -> один пробел
+    return RE_WHITESPACE.sub(' ', s).strip()
+
+
+def index_skus_by_pid(scripts_text: str):
+    """
+    Строит индекс {product_id: sku} за один проход по тексту скриптов.
+    Каждый найденный SKU привязывается к ближайшей ссылке на товар.
+
+    Args:
+        scripts_text: Объединенный текст всех <script> страницы
+
+    Returns:
+        Словарь {product_id: sku}
+    """
+    positions = []
+    pids = []
+    for m in RE_PRODUCT_ID.finditer(scripts_text):
+        positions.append(m.start())
+        pids.append(m.group(1) or m.group(2))
+
+    index = {}
+    if not positions:
+        return index
+
+    for m in RE_SKU.finditer(scripts_text):
+        i = bisect_left(positions, m.start())
+        # Выбираем ближайшую ссылку слева или справа от SKU
+        if i == len(positions) or (i > 0 and m.start() - positions[i - 1] <= positions[i] - m.start()):
+            i -= 1
+        index.setdefault(pids[i], m.group(1))
+    return index
 
 
 def parse_html_with_bs4(raw_html: str):
@@ -60,14 +130,32 @@ def parse_html_with_bs4(raw_html: str):
     Парсит HTML с использованием BeautifulSoup для извлечения информации о товарах.
 
     Args:
-        raw_html: HTML-код страницы
+        raw_html: HTML-код страницы (str или байты в UTF-8)
 
     Returns:
         Словарь с информацией о товарах {product_id: {name, sku, prices}}
     """
-    soup = BeautifulSoup(raw_html, 'html.parser')
+    if isinstance(raw_html, bytes):
+        # Байты декодирует сам парсер (для lxml - на стороне C)
+        soup = BeautifulSoup(raw_html, BS4_PARSER, from_encoding='utf-8')
+    else:
+        soup = BeautifulSoup(raw_html, BS4_PARSER)
     items = {}
 
+    # Тексты <script> собираем один раз, а не на каждую ссылку
+    script_blobs = [s.string for s in soup.find_all('script') if s.string]
+    sku_by_pid = index_skus_by_pid('\n'.join(script_blobs))
+    # Первый SKU каждого скрипта - для товаров, которых нет в индексе
+    script_skus = []
+    for blob in script_blobs:
+        m_sku = RE_SKU.search(blob)
+        if m_sku:
+            script_skus.append((blob, m_sku.group(1)))
+
+    # Цены, найденные в тексте контейнера: соседние ссылки делят общих
+    # предков, поэтому get_text() каждого предка считаем один раз
+    container_prices = {}
+
     # Поиск товаров по ссылкам
     for a in soup.find_all('a', href=True):
         href = a['href']
@@ -85,25 +173,27 @@ def parse_html_with_bs4(raw_html: str):
 
         # Поиск цен в родительских элементах
         prices = []
+        seen_prices = set()
         container = a.parent
         for _ in range(4):
             if container:
-                text = container.get_text(separator=' ', strip=True)
-                found_prices = RE_PRICE.findall(text)
-                for p in found_prices:
-                    cleaned_p = clean_text(p)
-                    if cleaned_p not in prices:
+                found_prices = container_prices.get(id(container))
+                if found_prices is None:
+                    text = container.get_text(separator=' ', strip=True)
+                    found_prices = [clean_text(p) for p in RE_PRICE.findall(text)]
+                    container_prices[id(container)] = found_prices
+                for cleaned_p in found_prices:
+                    if cleaned_p not in seen_prices:
+                        seen_prices.add(cleaned_p)
                         prices.append(cleaned_p)
                 container = container.parent
 
         # Поиск SKU в JavaScript-коде
-        sku = ''
-        scripts = soup.find_all('script')
-        for script in scripts:
-            if script.string and pid in script.string:
-                m_sku = RE_SKU.search(script.string)
-                if m_sku:
-                    sku = m_sku.group(1)
+        sku = sku_by_pid.get(pid, '')
+        if not sku:
+            for blob, blob_sku in script_skus:
+                if pid in blob:
+                    sku = blob_sku
                     break
 
         items[pid] = {
@@ -113,13 +203,15 @@ def parse_html_with_bs4(raw_html: str):
         }
 
     # Поиск по карточкам товаров (элементы с классами card/tile/product)
-    for card in soup.find_all('div', class_=re.compile(r'card|tile|product', re.I)):
+    for card in soup.find_all('div', class_=RE_CARD_CLASS):
         a = card.find('a', href=True)
         if a:
             m = RE_PRODUCT_ID.search(a['href'])
             pid = m.group(1) if m and m.group(1) else (m.group(2) if m and m.group(2) else None)
             if pid and pid not in items:
                 name = clean_text(card.get_text(separator=' ', strip=True))
+                # Цены ищутся в тексте без разделителя: разряды цены,
+                # разбитые разметкой на несколько узлов, остаются одним числом
                 prices = [clean_text(p) for p in RE_PRICE.findall(card.get_text())]
                 prices = list(dict.fromkeys(prices))[:MAX_PRICES_PER_ITEM]
                 sku = ''
@@ -133,6 +225,27 @@ def parse_html_with_bs4(raw_html: str):
     return items
 
 
+def iter_product_ids(raw_html: str):
+    """
+    Находит ссылки на товары в HTML.
+
+    Позиции маркера '/product/' (в любом регистре) находит RE_PRODUCT_MARKER,
+    а шаблон ссылки (стандартный re) применяется только в этих позициях,
+    так что документ просматривается один раз при любом движке RE_PRODUCT_ID.
+
+    Args:
+        raw_html: HTML-код страницы
+
+    Yields:
+        Кортежи (product_id, start, end) с позициями совпадения
+    """
+    match = RE_PRODUCT_LINK_TAIL.match
+    for marker in RE_PRODUCT_MARKER.finditer(raw_html):
+        m = match(raw_html, marker.start())
+        if m:
+            yield m.group(1), m.start(), m.end()
+
+
 def parse_html_fallback(raw_html: str):
     """
     Fallback-парсинг HTML через регулярные выражения (если BeautifulSoup недоступен).
@@ -144,27 +257,20 @@ def parse_html_fallback(raw_html: str):
         Словарь с информацией о товарах {product_id: {name, sku, prices}}
     """
     items = {}
-    for m in RE_PRODUCT_ID.finditer(raw_html):
-        pid = m.group(1) if m.group(1) else (m.group(2) if m.group(2) else None)
-        if not pid:
-            continue
-
-        start, end = m.start(), m.end()
+    for pid, start, end in iter_product_ids(raw_html):
         window = raw_html[max(0, start - SEARCH_WINDOW_SIZE): end + SEARCH_WINDOW_SIZE]
 
-        # Поиск названия товара в различных атрибутах
-        name_match = (
-            re.search(r'alt=\"([^\"]{5,300}?)(\"|>)', window) or
-            re.search(r'title=\"([^\"]{5,300}?)(\"|>)', window) or
-            re.search(r'aria-label=\"([^\"]{5,300}?)(\"|>)', window) or
-            re.search(r'>([^<]{10,400}?)<', window)
-        )
-        name = clean_text(name_match.group(1)) if name_match else ''
+        # Поиск названия товара в различных атрибутах (первый сработавший шаблон)
+        name = ''
+        for pattern in RE_NAME_PATTERNS:
+            name_match = pattern.search(window)
+            if name_match:
+                name = clean_text(name_match.group(1))
+                break
 
         # Поиск цен
-        prices = [clean_text(p) for p in RE_PRICE.findall(window)]
-        seen = set()
-        prices = [p for p in prices if p and p not in seen and not seen.add(p)][:MAX_PRICES_PER_ITEM]
+        prices = filter(None, (clean_text(p) for p in RE_PRICE.findall(window)))
+        prices = list(dict.fromkeys(prices))[:MAX_PRICES_PER_ITEM]
 
         # Поиск SKU
         sku_match = RE_SKU.search(window)
@@ -180,6 +286,30 @@ def parse_html_fallback(raw_html: str):
     return items
 
 
+def parse_html_file(file_path: Path):
+    """
+    Читает и парсит один HTML-файл.
+    Вызывается в дочерних процессах из parse_all_html_files.
+
+    Args:
+        file_path: Путь к HTML-файлу
+
+    Returns:
+        Словарь с информацией о товарах {product_id: {name, sku, prices}}
+    """
+    with open(file_path, 'rb') as f:
+        # BeautifulSoup нужны байты целиком, mmap дал бы только лишнюю копию
+        if HAS_BS4:
+            return parse_html_with_bs4(f.read())
+
+        if os.fstat(f.fileno()).st_size == 0:
+            return {}
+        # Для регулярных выражений файл отображается в память, чтобы не держать
+        # одновременно прочитанные байты и декодированную строку
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return parse_html_fallback(str(mm, encoding='utf-8', errors='ignore'))
+
+
 def parse_all_html_files(directory: Path):
     """
     Парсит все HTML-файлы в указанной директории и объединяет результаты.
@@ -193,23 +323,34 @@ def parse_all_html_files(directory: Path):
         - html_files: Список обработанных HTML-файлов
     """
     merged_items = {}
-    html_files = list(directory.glob('*.html')) + list(directory.glob('*.htm'))
-    html_files = sorted(html_files)
-
-    for file_path in html_files:
-        logging.info(f"Parsing file: {file_path.name}")
-        try:
-            raw_html = file_path.read_text(encoding='utf-8', errors='ignore')
+    merged_prices = {}  # pid -> множество уже добавленных цен (для O(1) проверки)
+    # Один проход по директории вместо двух вызовов glob
+    with os.scandir(directory) as entries:
+        html_files = sorted(
+            directory / entry.name for entry in entries
+            if entry.name.endswith(HTML_SUFFIXES) and entry.is_file()
+        )
 
-            # Выбираем метод парсинга
-            if HAS_BS4:
-                parsed = parse_html_with_bs4(raw_html)
-            else:
-                parsed = parse_html_fallback(raw_html)
+    if not html_files:
+        return merged_items, html_files
+
+    # Файлы парсятся параллельно в отдельных процессах,
+    # объединение идет в основном процессе в порядке сортировки файлов
+    workers = min(len(html_files), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(parse_html_file, file_path) for file_path in html_files]
+        for file_path, future in zip(html_files, futures):
+            logging.info(f"Parsing file: {file_path.name}")
+            try:
+                parsed = future.result()
+            except Exception as e:
+                logging.error(f"Error parsing file {file_path.name}: {str(e)}", exc_info=True)
+                continue
 
             # Объединяем результаты
             for pid, data in parsed.items():
-                entry = merged_items.setdefault(pid, {'name': '', 'sku': '', 'prices': [], 'sources': []})
+                entry = merged_items.setdefault(pid, {'name': '', 'sku': '', 'prices': [], 'sources': set()})
+                seen_prices = merged_prices.setdefault(pid, set())
 
                 # Обновляем название, если оно пустое
                 if data['name'] and not entry['name']:
@@ -221,39 +362,15 @@ def parse_all_html_files(directory: Path):
 
                 # Добавляем уникальные цены
                 for price in data['prices']:
-                    if price and price not in entry['prices']:
+                    if price and price not in seen_prices:
+                        seen_prices.add(price)
                         entry['prices'].append(price)
 
                 # Добавляем источник
-                if file_path.name not in entry['sources']:
-                    entry['sources'].append(file_path.name)
-
-        except Exception as e:
-            logging.error(f"Error parsing file {file_path.name}: {str(e)}", exc_info=True)
+                entry['sources'].add(file_path.name)
 
     return merged_items, html_files
 
-def indent_xml(elem, level=0):
-    """
-    Рекурсивно добавляет отступы в XML для красивого форматирования.
-
-    Args:
-        elem: XML-элемент
-        level: Уровень вложенности
-    """
-    i = "\n" + level * "  "
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = i + "  "
-        for sub_elem in elem:
-            indent_xml(sub_elem, level + 1)
-        if not sub_elem.tail or not sub_elem.tail.strip():
-            sub_elem.tail = i
-    else:
-        if level and (not elem.tail or not elem.tail.strip()):
-            elem.tail = i
-
-
 def write_xml_and_log(merged_items, xml_path: Path, log_path: Path):
     """
     Записывает данные о товарах в XML-файл и логирует пропущенные товары.
@@ -268,11 +385,15 @@ def write_xml_and_log(merged_items, xml_path: Path, log_path: Path):
         - written: Количество записанных товаров
         - skipped: Количество пропущенных товаров
     """
-    root = ET.Element('items')
+    parts = []
     skipped = []
     written = 0
 
-    for pid, data in sorted(merged_items.items(), key=lambda x: int(x[0])):
+    # int(pid) вычисляется один раз на товар, а не при каждом сравнении
+    decorated = [(int(pid), pid, data) for pid, data in merged_items.items()]
+    decorated.sort(key=itemgetter(0))
+
+    for _, pid, data in decorated:
         prices = data['prices'][:MAX_PRICES_PER_ITEM]
         price1 = prices[0] if len(prices) >= 1 else ''
         price2 = prices[1] if len(prices) >= 2 else ''
@@ -295,35 +416,39 @@ def write_xml_and_log(merged_items, xml_path: Path, log_path: Path):
                     'name': name,
                     'sku': sku
                 },
-                'sources': data['sources'],
+                'sources': sorted(data['sources']),
                 'note': 'skipped - missing fields'
             }
             skipped.append(log_entry)
         else:
-            item_elem = ET.SubElement(root, 'item')
-            ET.SubElement(item_elem, 'price1').text = price1
-            ET.SubElement(item_elem, 'price2').text = price2
-            ET.SubElement(item_elem, 'name').text = name
-            ET.SubElement(item_elem, 'sku').text = sku
+            # Схема фиксированная, поэтому XML собирается строкой
+            # сразу с отступами, без построения дерева элементов
+            parts.append(
+                f"  <item>\n"
+                f"    <price1>{escape(price1)}</price1>\n"
+                f"    <price2>{escape(price2)}</price2>\n"
+                f"    <name>{escape(name)}</name>\n"
+                f"    <sku>{escape(sku)}</sku>\n"
+                f"  </item>\n"
+            )
             written += 1
-    
-    # Форматируем XML для красивого вывода
-    indent_xml(root)
 
     try:
-        # Записываем XML
-        tree = ET.ElementTree(root)
-        tree.write(xml_path, encoding='utf-8', xml_declaration=True)
+        # Записываем XML одним вызовом
+        body = f"<items>\n{''.join(parts)}</items>" if parts else "<items />"
+        xml_bytes = ("<?xml version='1.0' encoding='utf-8'?>\n" + body).encode('utf-8')
+        with open(xml_path, 'wb') as f:
+            f.write(xml_bytes)
         logging.info(f"XML written to {xml_path}")
     except Exception as e:
         logging.error(f"Error writing XML: {str(e)}", exc_info=True)
 
     try:
         # Записываем лог в формате JSONL
+        # Собираем весь лог в одну строку и пишем одним вызовом
+        lines = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in skipped)
         with log_path.open('w', encoding='utf-8') as f:
-            for entry in skipped:
-                json.dump(entry, f, ensure_ascii=False)
-                f.write('\n')
+            f.write(lines)
         logging.info(f"Parse log written to {log_path}")
     except Exception as e:
         logging.error(f"Error writing parse log: {str(e)}", exc_info=True)
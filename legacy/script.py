@@ -5,19 +5,26 @@ Ozon Product Scraper
 """
 
 import json
+import sys
 import logging
-import time
-import random
 import os
-import shutil
 from datetime import datetime
 from undetected_chromedriver import Chrome, ChromeOptions
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 import threading
 import subprocess
+import queue
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Парсер HTML нужен только для подсчета товаров в логе
+try:
+    from parse_ozon_grok import parse_html_with_bs4, parse_html_fallback, HAS_BS4
+    HAS_HTML_PARSER = True
+except Exception:
+    HAS_HTML_PARSER = False
 
 # ==================== КОНСТАНТЫ ====================
 CONFIG_FILE = 'config.json'
@@ -28,23 +35,64 @@ HTML_FILE_TEMPLATE = 'page_source_page_{}.html'
 # Параметры Chrome
 CHROME_VERSION = 142
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36'
+CHROME_ARGUMENTS = (
+    "--headless",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-notifications",
+    "--disable-gpu",
+    "--log-level=3",
+    f"--user-agent={USER_AGENT}",
+    "--disable-blink-features=AutomationControlled",
+)
+CHROME_PREFS = {"profile.default_content_setting_values.notifications": 2}
 
 # Таймауты (в секундах)
 INITIAL_WAIT = 10
 VERIFICATION_TIMEOUT = 60
-EMPTY_PAGE_CHECK_TIMEOUT = 5
-SCROLL_DELAY_MIN = 2
-SCROLL_DELAY_MAX = 4
-PARSER_DELAY = 10
+SCROLL_TIMEOUT = 150
+
+# Буфер записи HTML-файлов (1 МБ)
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Признаки готовности страницы
+# Только ссылки в выдаче: полка рекомендаций есть и на странице «ничего не нашлось»
+PRODUCT_LINK_SELECTOR = "[data-widget='searchResultsV2'] a[href*='/product/']"
+EMPTY_PAGE_XPATH = "//*[contains(text(), 'ничего не нашлось')]"
 
 # Параметры скроллинга
-SCROLL_STEP_MIN = 500
-SCROLL_STEP_MAX = 1500
-MAX_SCROLL_ATTEMPTS = 50
-MAX_NO_CHANGE_SCROLLS = 5
+SCROLL_POLL_INTERVAL_MS = 1000  # Интервал проверки высоты страницы в браузере
+MAX_NO_CHANGE_SCROLLS = 5  # Сколько проверок подряд высота должна не меняться
+
+# Скролл выполняется целиком в браузере: прыжок в конец страницы на каждом тике,
+# завершение - когда высота перестала расти или истекло время
+AUTOSCROLL_SCRIPT = """
+const [intervalMs, stableChecks, timeoutMs, done] = arguments;
+const startedAt = Date.now();
+let lastHeight = 0;
+let stable = 0;
+const timer = setInterval(() => {
+    window.scrollTo(0, document.body.scrollHeight);
+    const height = document.body.scrollHeight;
+    if (height === lastHeight) {
+        stable += 1;
+    } else {
+        lastHeight = height;
+        stable = 0;
+    }
+    if (stable >= stableChecks || Date.now() - startedAt >= timeoutMs) {
+        clearInterval(timer);
+        done(height);
+    }
+}, intervalMs);
+"""
 
 # Параметры многопоточности
-GROUP_SIZE = 20
+EMPTY_PAGES_TO_STOP = 3  # Сколько пустых страниц подряд означают конец каталога
+PAGE_RETRIES = 2  # Сколько раз повторять страницу, загрузка которой завершилась ошибкой
+FAILED_PAGES_TO_STOP = 5  # Сколько неудачных (после повторов) страниц подряд прерывают парсинг
+DRIVER_POOL_SIZE = 5  # Количество одновременно запущенных браузеров
+MAX_WORKERS = 8  # Максимум одновременно обрабатываемых страниц
 
 # ==================== НАСТРОЙКА ЛОГИРОВАНИЯ ====================
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -57,7 +105,6 @@ logger.addHandler(file_handler)
 # ==================== ГЛОБАЛЬНЫЕ ПЕРЕМЕННЫЕ ====================
 # Locks для синхронизации потоков
 driver_lock = threading.Lock()
-file_lock = threading.Lock()
 
 
 # ==================== ФУНКЦИИ ====================
@@ -91,30 +138,129 @@ def archive_old_html_files():
     os.makedirs(archive_subdir)
     logger.info(f"Создана подпапка {archive_subdir} для архивации.")
 
-    old_files = [f for f in os.listdir('.') if f.startswith('page_source_page_') and f.endswith('.html')]
+    with os.scandir('.') as entries:
+        old_files = [
+            entry.name for entry in entries
+            if entry.name.startswith('page_source_page_') and entry.name.endswith('.html') and entry.is_file()
+        ]
     if old_files:
+        # Архив лежит в той же директории, поэтому достаточно переименования
         for old_file in old_files:
-            shutil.move(old_file, os.path.join(archive_subdir, old_file))
+            os.replace(old_file, os.path.join(archive_subdir, old_file))
         logger.info(f"Перемещено {len(old_files)} старых файлов в {archive_subdir}.")
     else:
         logger.info("Старых HTML-файлов не найдено.")
 
 def create_chrome_options():
-    """Создает и настраивает опции для Chrome WebDriver"""
+    """
+    Создает опции для Chrome WebDriver из заранее подготовленных констант.
+
+    Объект опций нельзя переиспользовать: undetected-chromedriver привязывает
+    его к запущенному браузеру, поэтому для каждого драйвера создается новый.
+    """
     options = ChromeOptions()
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-notifications")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--log-level=3")
-    options.add_argument(f"--user-agent={USER_AGENT}")
-    options.add_experimental_option("prefs", {"profile.default_content_setting_values.notifications": 2})
-    options.add_argument("--disable-blink-features=AutomationControlled")
+    for argument in CHROME_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_experimental_option("prefs", CHROME_PREFS)
     return options
 
 
-def parse_page(page_number, results, seller_url):
+def create_driver():
+    """Запускает Chrome WebDriver (запуск сериализуется через driver_lock)"""
+    options = create_chrome_options()
+    with driver_lock:
+        return Chrome(options=options, version_main=CHROME_VERSION)
+
+
+def fill_driver_pool(pool, size):
+    """
+    Запускает браузеры, переиспользуемые между страницами.
+
+    Args:
+        pool: Очередь, в которую складываются запущенные WebDriver
+        size: Количество браузеров в пуле
+    """
+    for _ in range(size):
+        pool.put(create_driver())
+    logger.info(f"Запущено браузеров в пуле: {size}.")
+
+
+def replace_driver(driver):
+    """
+    Заменяет сломанный браузер (упавший Chrome, потерянная сессия) новым.
+
+    Args:
+        driver: WebDriver, завершившийся ошибкой
+
+    Returns:
+        Новый WebDriver или прежний, если запустить новый не удалось
+    """
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+    try:
+        new_driver = create_driver()
+        logger.info(f"[Поток {threading.current_thread().name}] Браузер перезапущен.")
+        return new_driver
+    except Exception as e:
+        # Пул не должен уменьшаться, иначе потоки будут вечно ждать браузер;
+        # прежний драйвер вернется в пул, и страницы на нем завершатся ошибкой
+        logger.error(f"[Поток {threading.current_thread().name}] Не удалось перезапустить браузер: {str(e)}")
+        return driver
+
+
+def close_driver_pool(pool):
+    """Закрывает все браузеры из пула"""
+    while not pool.empty():
+        driver = pool.get_nowait()
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Не удалось закрыть браузер: {str(e)}")
+
+
+def save_page_source(page_number, source):
+    """
+    Сохраняет HTML страницы в файл.
+
+    Args:
+        page_number: Номер страницы
+        source: HTML-код страницы
+
+    Returns:
+        Имя сохраненного файла
+    """
+    filename = HTML_FILE_TEMPLATE.format(page_number)
+    # Временное имя уникально для процесса и потока, поэтому блокировка не нужна;
+    # os.replace атомарно подставляет готовый файл под итоговым именем
+    tmp_filename = f'{filename}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+    with open(tmp_filename, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(source.encode('utf-8'))
+    os.replace(tmp_filename, filename)
+    logger.info(f"[Поток {threading.current_thread().name}] HTML сохранён в {filename}.")
+
+    return filename
+
+
+def log_items_count(page_number, source):
+    """Подсчитывает товары на странице для лога (опционально)"""
+    if not HAS_HTML_PARSER:
+        return
+
+    try:
+        if HAS_BS4:
+            items = parse_html_with_bs4(source)
+        else:
+            items = parse_html_fallback(source)
+        logger.info(f"[Поток {threading.current_thread().name}] Найдено товаров на странице {page_number}: {len(items)}")
+    except Exception as e:
+        logger.warning(f"[Поток {threading.current_thread().name}] Не удалось посчитать товары: {str(e)}")
+
+
+def parse_page(page_number, results, seller_url, driver_pool):
     """
     Парсит одну страницу каталога Ozon.
 
@@ -122,91 +268,47 @@ def parse_page(page_number, results, seller_url):
         page_number: Номер страницы для парсинга
         results: Словарь для сохранения результатов
         seller_url: Базовый URL продавца
+        driver_pool: Очередь свободных WebDriver
     """
-    try:
-        options = create_chrome_options()
-
-        with driver_lock:
-            driver = Chrome(options=options, version_main=CHROME_VERSION)
+    current_url = f"{seller_url}&page={page_number}" if page_number > 1 else seller_url
 
-        current_url = f"{seller_url}&page={page_number}" if page_number > 1 else seller_url
+    # Берем свободный браузер из пула (ждем, если все заняты)
+    driver = driver_pool.get()
+    try:
         driver.get(current_url)
         logger.info(f"[Поток {threading.current_thread().name}] Открыта страница {page_number}: {current_url}")
 
-        time.sleep(INITIAL_WAIT)
-
-        # Проверка на экран верификации браузера
+        # Ждем первую карточку товара в выдаче или сообщение о пустой странице -
+        # что появится раньше. Экран проверки браузера покрывается этим же
+        # ожиданием: пока он показан, ни того ни другого на странице нет.
+        # Пустота определяется по маркеру, а не по тому, какое условие сработало.
+        is_empty = False
         try:
-            WebDriverWait(driver, INITIAL_WAIT).until(
-                EC.presence_of_element_located((By.XPATH, "//*[contains(text(), 'Пожалуйста, дождитесь окончания проверки браузера')]"))
-            )
-            logger.info(f"[Поток {threading.current_thread().name}] Обнаружен экран проверки, ждем...")
-            WebDriverWait(driver, VERIFICATION_TIMEOUT).until_not(
-                EC.presence_of_element_located((By.XPATH, "//*[contains(text(), 'Пожалуйста, дождитесь окончания проверки браузера')]"))
-            )
-            logger.info(f"[Поток {threading.current_thread().name}] Проверка завершена.")
+            WebDriverWait(driver, INITIAL_WAIT + VERIFICATION_TIMEOUT).until(EC.any_of(
+                EC.presence_of_element_located((By.CSS_SELECTOR, PRODUCT_LINK_SELECTOR)),
+                EC.presence_of_element_located((By.XPATH, EMPTY_PAGE_XPATH)),
+            ))
+            is_empty = bool(driver.find_elements(By.XPATH, EMPTY_PAGE_XPATH))
         except TimeoutException:
-            logger.info(f"[Поток {threading.current_thread().name}] Нет экрана проверки, продолжаем.")
+            logger.warning(f"[Поток {threading.current_thread().name}] Страница {page_number} не дождалась контента, продолжаем.")
 
-        # Проверка, есть ли товары на странице
-        is_empty = False
-        try:
-            WebDriverWait(driver, EMPTY_PAGE_CHECK_TIMEOUT).until(
-                EC.presence_of_element_located((By.XPATH, "//*[contains(text(), 'ничего не нашлось')]"))
-            )
+        if is_empty:
             logger.info(f"[Поток {threading.current_thread().name}] Страница {page_number} пустая.")
-            is_empty = True
-        except TimeoutException:
+        else:
             logger.info(f"[Поток {threading.current_thread().name}] Страница {page_number} с товарами.")
 
         # Скроллинг страницы для подгрузки всех товаров
         if not is_empty:
-            last_height = driver.execute_script("return document.body.scrollHeight")
-            no_change_count = 0
-            scroll_attempts = 0
-
-            while scroll_attempts < MAX_SCROLL_ATTEMPTS:
-                scroll_step = random.randint(SCROLL_STEP_MIN, SCROLL_STEP_MAX)
-                driver.execute_script(f"window.scrollBy(0, {scroll_step});")
-                time.sleep(random.uniform(SCROLL_DELAY_MIN, SCROLL_DELAY_MAX))
-
-                new_height = driver.execute_script("return document.body.scrollHeight")
-                if new_height == last_height:
-                    no_change_count += 1
-                    if no_change_count >= MAX_NO_CHANGE_SCROLLS:
-                        break
-                else:
-                    no_change_count = 0
-                last_height = new_height
-                scroll_attempts += 1
+            driver.set_script_timeout(SCROLL_TIMEOUT + 10)
+            driver.execute_async_script(
+                AUTOSCROLL_SCRIPT, SCROLL_POLL_INTERVAL_MS, MAX_NO_CHANGE_SCROLLS, SCROLL_TIMEOUT * 1000
+            )
             logger.info(f"[Поток {threading.current_thread().name}] Скролл завершен для страницы {page_number}.")
 
         # Сохранение HTML-кода страницы
         source = driver.page_source
-        base_filename = HTML_FILE_TEMPLATE.format(page_number)
-        filename = base_filename
-
-        with file_lock:
-            # Если файл уже существует, добавляем timestamp
-            if os.path.exists(filename):
-                file_timestamp = int(time.time())
-                filename = f'page_source_page_{page_number}_{file_timestamp}.html'
-                logger.warning(f"[Поток {threading.current_thread().name}] Файл {base_filename} существует, сохраняю как {filename}.")
-
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(source)
-            logger.info(f"[Поток {threading.current_thread().name}] HTML сохранён в {filename}.")
-
-        # Подсчет найденных товаров (опционально)
-        try:
-            from parse_ozon_grok import parse_html_with_bs4, parse_html_fallback, HAS_BS4
-            if HAS_BS4:
-                items = parse_html_with_bs4(source)
-            else:
-                items = parse_html_fallback(source)
-            logger.info(f"[Поток {threading.current_thread().name}] Найдено товаров на странице {page_number}: {len(items)}")
-        except Exception as e:
-            logger.warning(f"[Поток {threading.current_thread().name}] Не удалось посчитать товары: {str(e)}")
+        filename = save_page_source(page_number, source)
+        log_items_count(page_number, source)
 
         results[page_number] = {
             'is_empty': is_empty,
@@ -215,9 +317,13 @@ def parse_page(page_number, results, seller_url):
 
     except Exception as e:
         logger.error(f"[Поток {threading.current_thread().name}] Ошибка на странице {page_number}: {str(e)}")
-        results[page_number] = {'is_empty': True, 'filename': None}
+        # Ошибка загрузки - не признак конца каталога: страница не считается пустой
+        results[page_number] = {'is_empty': False, 'filename': None, 'failed': True}
+        # Браузер после ошибки WebDriver может быть нерабочим - не возвращаем его в пул
+        if isinstance(e, WebDriverException):
+            driver = replace_driver(driver)
     finally:
-        driver.quit()
+        driver_pool.put(driver)
 
 
 def run_parser(seller_url):
@@ -227,55 +333,130 @@ def run_parser(seller_url):
     Args:
         seller_url: Базовый URL продавца на Ozon
     """
-    page_number = 1
     results = {}
+    driver_pool = queue.Queue()
+
+    try:
+        fill_driver_pool(driver_pool, DRIVER_POOL_SIZE)
+        # Один ограниченный пул потоков на весь запуск, страницы отправляются по мере освобождения
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="Page") as executor:
+            run_pages(seller_url, results, driver_pool, executor)
+    finally:
+        close_driver_pool(driver_pool)
+
+    logger.info(f"Парсинг завершен. Обработано {len(results)} страниц.")
+
+
+def run_pages(seller_url, results, driver_pool, executor):
+    """
+    Обходит страницы каталога скользящим окном, пока не встретится
+    EMPTY_PAGES_TO_STOP пустых страниц подряд.
+
+    Страницы отправляются в пул по одной, не более MAX_WORKERS одновременно
+    (и по одной, если последняя обработанная страница оказалась пустой).
+    Как только найден хвост из пустых страниц, новые страницы не отправляются,
+    а еще не начатые задачи отменяются.
+
+    Страница, загрузка которой завершилась ошибкой, повторяется до PAGE_RETRIES раз
+    и в хвост пустых страниц не засчитывается. Если FAILED_PAGES_TO_STOP страниц
+    подряд не загрузились и после повторов, парсинг прерывается.
+
+    Args:
+        seller_url: Базовый URL продавца на Ozon
+        results: Словарь для сохранения результатов
+        driver_pool: Очередь свободных WebDriver
+        executor: Пул потоков для обработки страниц
+    """
+    pending = {}
+    attempts = {}
+    next_page = 1
+    stop_page = None
 
     while True:
-        threads = []
-        group_pages = [page_number + i for i in range(GROUP_SIZE)]
-
-        # Создаем и запускаем потоки для группы страниц
-        for pg in group_pages:
-            t = threading.Thread(
-                target=parse_page,
-                args=(pg, results, seller_url),
-                name=f"Thread-Page-{pg}"
-            )
-            threads.append(t)
-            t.start()
+        # Снимок результатов: словарь пополняется из рабочих потоков
+        snapshot = results.copy()
+
+        # Если последняя готовая страница пустая, вероятно близок конец каталога:
+        # сужаем окно до одной страницы, чтобы не запускать лишние браузеры
+        window = 1 if snapshot and snapshot[max(snapshot)]['is_empty'] else MAX_WORKERS
 
-        # Ждем завершения всех потоков
-        for t in threads:
-            t.join()
+        # Досылаем страницы до заполнения окна
+        while stop_page is None and len(pending) < window:
+            future = executor.submit(parse_page, next_page, results, seller_url, driver_pool)
+            pending[future] = next_page
+            next_page += 1
 
-        # Проверяем, пустая ли вся группа
-        group_empty = all(results.get(pg, {'is_empty': True})['is_empty'] for pg in group_pages)
-        if group_empty:
-            logger.info("Вся группа пустая. Завершаем парсинг.")
+        if not pending:
             break
 
-        # Проверяем последнюю страницу группы
-        if results.get(group_pages[-1], {'is_empty': False})['is_empty']:
-            prev_empty = all(results.get(pg, {'is_empty': True})['is_empty'] for pg in group_pages[:-1])
-            if prev_empty:
-                logger.info("Предыдущие страницы пустые. Завершаем парсинг.")
-                break
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            page = pending.pop(future)
+            if stop_page is None and results.get(page, {}).get('failed') and attempts.get(page, 0) < PAGE_RETRIES:
+                attempts[page] = attempts.get(page, 0) + 1
+                logger.warning(f"Страница {page} не загрузилась, повтор {attempts[page]}/{PAGE_RETRIES}.")
+                del results[page]
+                pending[executor.submit(parse_page, page, results, seller_url, driver_pool)] = page
+
+        if stop_page is None:
+            # Учитываем только страницы, обработка которых завершена
+            in_progress = set(pending.values())
+            settled = {page: result for page, result in results.copy().items() if page not in in_progress}
+
+            stop_page = find_empty_tail(settled)
+            if stop_page is not None:
+                logger.info(f"Страницы {stop_page}-{stop_page + EMPTY_PAGES_TO_STOP - 1} пустые. Завершаем парсинг.")
             else:
-                logger.info("Последняя пустая, но предыдущие имеют товары. Продолжаем.")
-        else:
-            logger.info("Группа обработана. Переходим к следующей.")
+                stop_page = find_failed_tail(settled)
+                if stop_page is not None:
+                    logger.error(f"Страницы {stop_page}-{stop_page + FAILED_PAGES_TO_STOP - 1} не загрузились. Прерываем парсинг.")
 
-        page_number += GROUP_SIZE
+            if stop_page is not None:
+                # Отменяем страницы за пустым хвостом, которые еще не начали выполняться
+                for future, page in list(pending.items()):
+                    if page > stop_page and future.cancel():
+                        del pending[future]
 
-    logger.info(f"Парсинг завершен. Обработано {len(results)} страниц.")
+
+def find_failed_tail(results):
+    """
+    Ищет первую серию из FAILED_PAGES_TO_STOP страниц подряд, не загрузившихся после повторов.
+
+    Args:
+        results: Словарь результатов по номерам страниц
+
+    Returns:
+        Номер первой страницы серии или None
+    """
+    for page in sorted(results):
+        if all(results.get(page + i, {}).get('failed') for i in range(FAILED_PAGES_TO_STOP)):
+            return page
+    return None
+
+
+def find_empty_tail(results):
+    """
+    Ищет первую серию из EMPTY_PAGES_TO_STOP пустых страниц подряд.
+
+    Args:
+        results: Словарь результатов по номерам страниц
+
+    Returns:
+        Номер первой страницы серии или None
+    """
+    for page in sorted(results):
+        if all(results.get(page + i, {'is_empty': False})['is_empty'] for i in range(EMPTY_PAGES_TO_STOP)):
+            return page
+    return None
 
 
 def run_html_parser():
     """Запускает скрипт parse_ozon_grok.py для обработки собранных HTML-файлов"""
-    logger.info(f"Ожидание {PARSER_DELAY} секунд перед запуском parse_ozon_grok.py...")
-    time.sleep(PARSER_DELAY)
+    # Ожидание не нужно: страницы сохраняются через os.replace, и к этому моменту
+    # все потоки парсинга уже завершены
     logger.info("Запуск parse_ozon_grok.py...")
-    subprocess.call(['python', 'parse_ozon_grok.py'])
+    # Тот же интерпретатор и окружение, что и у скрапера, а не первый python из PATH
+    subprocess.run([sys.executable, 'parse_ozon_grok.py'], check=False)
 
 
 def main():
@@ -11,7 +11,6 @@ from datetime import datetime
 
 from src.config.settings import Settings
 from src.parsers.api_parser import OzonAPIParser
-from src.parsers.html_parser import OzonHTMLParser
 from src.utils.exporter import DataExporter
 from src.utils.logger import setup_logger
 
@@ -92,6 +91,8 @@ def main():
         if args.method == 'html':
             headless = not args.no_headless  # Если --no-headless, то headless=False
             logger.info(f"Режим браузера: {'headless' if headless else 'с видимым окном'}")
+            # HTML парсер (bs4/lxml/selectolax) импортируется только для этого метода
+            from src.parsers.html_parser import OzonHTMLParser
             parser = OzonHTMLParser(seller_url, headless=headless)
         else:  # api
             parser = OzonAPIParser(seller_url)
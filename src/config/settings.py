@@ -7,6 +7,17 @@ import re
 from pathlib import Path
 from typing import Optional
 
+# Паттерны для извлечения ID продавца в порядке приоритета
+# (компилируются один раз при импорте):
+# 1. /seller/magazin-123456/
+# 2. ?miniapp=seller_123456
+# 3. /seller_123456 или /seller/123456
+_SELLER_ID_PATTERNS = (
+    re.compile(r'/seller/[^/]+-(\d+)'),
+    re.compile(r'seller_(\d+)'),
+    re.compile(r'/seller/(\d+)'),
+)
+
 
 class Settings:
     """Централизованные настройки приложения"""
@@ -47,16 +58,29 @@ class Settings:
 
     # Параметры многопоточности
     MAX_WORKERS = 3
+    # Общий лимит прямых HTTP-запросов к API: не чаще, чем переходы браузера
+    # (интервал REQUEST_DELAY_MIN), чтобы не вызывать подозрений анти-бот защиты
+    HTTP_REQUESTS_PER_SECOND = 1.0 / REQUEST_DELAY_MIN
 
     # Логирование
     LOG_LEVEL = 'INFO'  # Стандартный уровень (используйте DEBUG для детальной диагностики)
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+    # Сохранять HTML первой страницы в debug_html_page_1.html.gz (HTML метод)
+    DEBUG_SAVE_HTML = False
+
+    # Кэш config.json (читается с диска один раз)
+    _config: Optional[dict] = None
+    # Директории уже созданы в этом процессе
+    _dirs_ready = False
 
     @classmethod
     def load_config(cls) -> dict:
         """
-        Загружает конфигурацию из config.json
+        Загружает конфигурацию из config.json.
+
+        Файл читается только при первом вызове, дальше возвращается кэш.
+        Для повторного чтения используйте reload_config().
 
         Returns:
             dict с конфигурацией
@@ -65,6 +89,9 @@ class Settings:
             FileNotFoundError: если config.json не найден
             ValueError: если отсутствуют обязательные поля
         """
+        if cls._config is not None:
+            return cls._config
+
         if not cls.CONFIG_FILE.exists():
             raise FileNotFoundError(f"Файл конфигурации не найден: {cls.CONFIG_FILE}")
 
@@ -74,8 +101,20 @@ class Settings:
         if 'seller_url' not in config:
             raise ValueError("В config.json отсутствует обязательное поле 'seller_url'")
 
+        cls._config = config
         return config
 
+    @classmethod
+    def reload_config(cls) -> dict:
+        """
+        Сбрасывает кэш и заново загружает config.json
+
+        Returns:
+            dict с конфигурацией
+        """
+        cls._config = None
+        return cls.load_config()
+
     @classmethod
     def get_seller_id(cls, seller_url: str) -> Optional[str]:
         """
@@ -87,19 +126,10 @@ class Settings:
         Returns:
             ID продавца или None
         """
-        # Паттерны для извлечения ID:
-        # 1. /seller/magazin-123456/
-        # 2. ?miniapp=seller_123456
-        # 3. /seller_123456
-
-        patterns = [
-            r'/seller/[^/]+-(\d+)',
-            r'seller_(\d+)',
-            r'/seller/(\d+)',
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, seller_url)
+        # Каждый паттерн ищется по всей строке: более приоритетный выигрывает,
+        # даже если менее приоритетный совпадает левее
+        for pattern in _SELLER_ID_PATTERNS:
+            match = pattern.search(seller_url)
             if match:
                 return match.group(1)
 
@@ -140,6 +170,10 @@ class Settings:
 
     @classmethod
     def ensure_directories(cls):
-        """Создает необходимые директории"""
+        """Создает необходимые директории (только при первом вызове)"""
+        if cls._dirs_ready:
+            return
+
         cls.ARCHIVE_DIR.mkdir(exist_ok=True)
         cls.OUTPUT_DIR.mkdir(exist_ok=True)
+        cls._dirs_ready = True
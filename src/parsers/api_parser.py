@@ -2,17 +2,47 @@
 Парсер магазина Ozon через API Composer
 """
 
+import io
 import json
+import re
+import sys
 import time
 import logging
 import random
-from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict
+from typing import Any, Iterable, Iterator, List, Dict, Optional, Set, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from urllib.parse import quote
 
 from src.config.settings import Settings
+from src.utils.rate_limiter import RateLimiter
 from src.utils.selenium_manager import SeleniumManager
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
+try:
+    import requests
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+try:
+    import httpx
+    import h2  # noqa: F401 - нужен httpx для HTTP/2
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+
 try:
     from src.utils.playwright_manager import PlaywrightManager, HAS_PLAYWRIGHT
 except ImportError:
@@ -21,8 +51,83 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# orjson в разы быстрее стандартного json; его JSONDecodeError наследует json.JSONDecodeError
+json_loads = orjson.loads if HAS_ORJSON else json.loads
+JSON_ERRORS = (json.JSONDecodeError, ijson.JSONError) if HAS_IJSON else (json.JSONDecodeError,)
+HTTP_ERRORS = ((httpx.HTTPError,) if HAS_HTTPX else ()) + ((requests.RequestException,) if HAS_REQUESTS else ())
+
+# Отображаемые имена API endpoints в порядке приоритета
+API_ENDPOINT_NAMES = {
+    Settings.OZON_API_BASE_MOBILE: "Mobile API",
+    Settings.OZON_API_BASE_DESKTOP: "Desktop API",
+}
+ALL_API_ENDPOINTS = tuple(API_ENDPOINT_NAMES)
+
+# Ключи виджетов, в которых могут быть товары
+RE_PRODUCT_WIDGET_KEY = re.compile(r'searchresult|seller|product|tile', re.IGNORECASE)
+# Ключи массивов товаров, которые ищет _extract_items_from_widget
+WIDGET_ITEMS_MARKERS = ('"items"', '"products"')
+
+
+# Поля с ценами в порядке приоритета
+CURRENT_PRICE_KEYS = ('text', 'current', 'finalPrice', 'displayPrice')  # в объекте price
+ORIGINAL_PRICE_KEYS = ('originalPrice', 'original', 'ozonCardPrice')  # в объекте price
+ITEM_PRICE_KEYS = ('finalPrice', 'displayPrice')  # прямо в item
+
+
+def first_value(data: dict, keys: Tuple[str, ...]) -> Any:
+    """
+    Возвращает первое непустое значение по списку ключей.
+
+    Args:
+        data: Словарь с данными
+        keys: Ключи в порядке приоритета
+
+    Returns:
+        Первое непустое значение или ''
+    """
+    for key in keys:
+        value = data.get(key)
+        if value:
+            return value
+    return ''
+
+
+def format_price(value) -> str:
+    """
+    Приводит цену к строке, добавляя ₽ к числовым значениям.
+
+    Args:
+        value: Цена (строка, число или None)
+
+    Returns:
+        Строка с ценой
+    """
+    if isinstance(value, (int, float)):
+        return f"{value} ₽"
+    return to_str(value)
+
+
+def to_str(value) -> str:
+    """
+    Приводит значение поля из JSON к строке.
+
+    Args:
+        value: Значение поля (str, число или None)
+
+    Returns:
+        Исходная строка без копирования, '' для None, иначе str(value)
+    """
+    if value is None:
+        return ''
+    return value if isinstance(value, str) else str(value)
 
-@dataclass
+
+# __slots__ у dataclass доступны с Python 3.10
+DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**DATACLASS_SLOTS)
 class ProductInfo:
     """Информация о товаре"""
     sku: str
@@ -42,7 +147,23 @@ class ProductInfo:
 
     def to_dict(self) -> dict:
         """Преобразует в словарь"""
-        return asdict(self)
+        # Все поля - str/bool, поэтому глубокое копирование asdict не нужно
+        return {
+            'sku': self.sku,
+            'name': self.name,
+            'current_price': self.current_price,
+            'original_price': self.original_price,
+            'link': self.link,
+            'image_url': self.image_url,
+            'rating': self.rating,
+            'reviews_count': self.reviews_count,
+            'seller_name': self.seller_name,
+            'seller_inn': self.seller_inn,
+            'category': self.category,
+            'brand': self.brand,
+            'success': self.success,
+            'error': self.error,
+        }
 
 
 class OzonAPIParser:
@@ -61,14 +182,31 @@ class OzonAPIParser:
         """
         self.seller_url = seller_url
         self.seller_id = Settings.get_seller_id(seller_url)
+        # Путь магазина без https://www.ozon.ru - одинаков для всех страниц,
+        # поэтому URL-кодируем его и префикс параметра page один раз
+        self.seller_path = seller_url.replace(Settings.OZON_BASE_URL, '')
+        page_separator = '&' if '?' in self.seller_path else '?'
+        self.encoded_seller_path = quote(self.seller_path, safe='')
+        self.encoded_page_prefix = quote(f'{page_separator}page=', safe='')
         self.selenium_manager = SeleniumManager()
         self.playwright_manager = PlaywrightManager() if HAS_PLAYWRIGHT else None
         self.products: List[ProductInfo] = []
         self.use_playwright = False  # Флаг использования Playwright
+        self.browser_ready = False  # Браузер запускается только когда понадобится
+
+        # HTTP-сессия для загрузки страниц API напрямую, браузер - запасной вариант
+        self.http_session = None
+        self.http_executor: Optional[ThreadPoolExecutor] = None
+        self.http_pending: Dict[int, Future] = {}  # Загружаемые по HTTP страницы
+        # Общий для всех потоков лимит запросов вместо задержки после каждой страницы
+        self.http_rate_limiter = RateLimiter(Settings.HTTP_REQUESTS_PER_SECOND, burst=1)
+        self.use_http = HAS_HTTPX or HAS_REQUESTS
+        self.http_cookies_from_browser = False  # В сессию уже переданы cookies браузера
+        self.http_forbidden = False  # Получен 403 на последнем окне страниц
 
         # API endpoint management
         self.current_api_endpoint = Settings.OZON_API_BASE_MOBILE
-        self.tried_endpoints = []  # Список уже попробованных endpoints
+        self.tried_endpoints: Set[str] = set()  # Уже попробованные endpoints
         self.api_endpoint_failures = 0  # Счетчик ошибок текущего endpoint
 
         if not self.seller_id:
@@ -94,38 +232,46 @@ class OzonAPIParser:
         logger.info(f"   Начинаем с: Mobile API")
 
         try:
-            # Для мобильного API приоритетнее использовать Playwright
-            if HAS_PLAYWRIGHT and self.playwright_manager:
-                try:
-                    logger.info("Инициализация Playwright (приоритет для mobile API)...")
-                    self.playwright_manager.create_browser(headless=True)
-                    logger.info("Playwright инициализирован")
-                    self.use_playwright = True
-                except Exception as e:
-                    logger.warning(f"Не удалось инициализировать Playwright: {e}")
-                    # Fallback на Selenium
-                    logger.info("Переключаемся на Selenium как fallback...")
-                    self.selenium_manager.create_driver(headless=True)
-                    logger.info("WebDriver (Selenium) инициализирован")
-                    self.use_playwright = False
-            else:
-                # Playwright недоступен, используем Selenium
-                logger.info("Playwright недоступен, используем Selenium...")
-                self.selenium_manager.create_driver(headless=True)
-                logger.info("WebDriver (Selenium) инициализирован")
-                self.use_playwright = False
+            if self.use_http:
+                self.http_session = self._create_http_session()
 
             page_num = 1
             empty_pages_count = 0
             max_empty_pages = 3
             blocked_count = 0
             max_blocked = 1  # Переключаемся на Playwright сразу при первой блокировке
+            delay_min = Settings.REQUEST_DELAY_MIN
+            delay_max = Settings.REQUEST_DELAY_MAX
 
             while page_num <= max_pages:
                 logger.info(f"Парсинг страницы {page_num}/{max_pages}...")
 
                 try:
-                    page_products = self._parse_page(page_num)
+                    # Страницы загружаются по HTTP в фоне скользящим окном,
+                    # браузер - только для страниц, не прошедших по HTTP
+                    page_products = None
+                    http_attempted = False
+                    used_browser = False
+
+                    if self.http_session:
+                        self._schedule_http_pages(page_num, max_pages)
+                        page_products = self.http_pending.pop(page_num).result()
+                        http_attempted = True
+                        self._check_http_forbidden()
+
+                    if page_products is None:
+                        page_products = self._parse_page(page_num)
+                        used_browser = True
+
+                        if page_products and http_attempted:
+                            if not self.http_cookies_from_browser:
+                                # Браузер прошел анти-бот проверку - повторяем HTTP с его cookies
+                                self._load_browser_cookies()
+                                self._cancel_http_pages()
+                            else:
+                                # Даже с cookies браузера HTTP не видит товары - HTTP-запросы блокируются
+                                logger.warning("HTTP-запросы не возвращают товары, продолжаем через браузер")
+                                self._close_http_session()
 
                     if not page_products:
                         empty_pages_count += 1
@@ -135,6 +281,7 @@ class OzonAPIParser:
                         if self._should_try_alternative_endpoint():
                             if self._switch_to_alternative_endpoint():
                                 logger.info(f"🔄 Повторяем страницу {page_num} с новым endpoint")
+                                self._cancel_http_pages()  # Запрошены через старый endpoint
                                 empty_pages_count = 0  # Сбрасываем счетчик
                                 continue  # Пробуем эту же страницу снова
 
@@ -149,6 +296,7 @@ class OzonAPIParser:
                                 try:
                                     self.playwright_manager.create_browser(headless=True)
                                     self.use_playwright = True
+                                    self.browser_ready = True
                                     empty_pages_count = 0  # Сбрасываем счетчик пустых страниц
                                     logger.info("✅ Playwright успешно инициализирован, повторяем страницу")
                                     continue  # Пробуем текущую страницу снова с Playwright
@@ -169,10 +317,11 @@ class OzonAPIParser:
                         self.products.extend(page_products)
                         logger.info(f"Страница {page_num}: найдено {len(page_products)} товаров")
 
-                    # Задержка между страницами
-                    delay = random.uniform(Settings.REQUEST_DELAY_MIN, Settings.REQUEST_DELAY_MAX)
-                    logger.debug(f"Задержка перед следующей страницей: {delay:.1f} сек")
-                    time.sleep(delay)
+                    # Задержка между переходами браузера (HTTP ограничен http_rate_limiter)
+                    if used_browser:
+                        delay = random.uniform(delay_min, delay_max)
+                        logger.debug(f"Задержка перед следующей страницей: {delay:.1f} сек")
+                        time.sleep(delay)
 
                     page_num += 1
 
@@ -186,6 +335,7 @@ class OzonAPIParser:
                             self.selenium_manager.close()
                             self.playwright_manager.create_browser(headless=True)
                             self.use_playwright = True
+                            self.browser_ready = True
                             continue  # Пробуем текущую страницу снова
                         except:
                             break
@@ -196,6 +346,7 @@ class OzonAPIParser:
             return self.products
 
         finally:
+            self._close_http_session()
             self.selenium_manager.close()
             if self.playwright_manager:
                 self.playwright_manager.close()
@@ -213,6 +364,8 @@ class OzonAPIParser:
         # Формируем URL для API
         api_url = self._build_api_url(page_num)
 
+        self._ensure_browser()
+
         # Выбираем менеджер в зависимости от флага
         manager = self.playwright_manager if self.use_playwright else self.selenium_manager
 
@@ -235,23 +388,183 @@ class OzonAPIParser:
 
         # Парсим JSON
         try:
-            data = json.loads(json_content)
-
-            # Сохраняем пример JSON для отладки (только первая страница)
-            if page_num == 1:
-                debug_file = Settings.PROJECT_ROOT / f'debug_page_{page_num}.json'
-                try:
-                    with open(debug_file, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, ensure_ascii=False, indent=2)
-                    logger.info(f"Пример JSON сохранен в {debug_file} для отладки")
-                except Exception as e:
-                    logger.debug(f"Не удалось сохранить debug JSON: {e}")
-
-            return self._extract_products_from_json(data)
-        except json.JSONDecodeError as e:
+            return self._extract_products_from_content(json_content, page_num)
+        except JSON_ERRORS as e:
             logger.error(f"Ошибка парсинга JSON: {e}")
             return []
 
+    def _ensure_browser(self):
+        """
+        Запускает браузер при первом обращении и дальше переиспользует его.
+
+        Пока страницы загружаются по HTTP, браузер не запускается вовсе.
+        Для мобильного API приоритетнее Playwright, Selenium - запасной вариант.
+        """
+        if self.browser_ready:
+            return
+
+        if HAS_PLAYWRIGHT and self.playwright_manager:
+            try:
+                logger.info("Инициализация Playwright (приоритет для mobile API)...")
+                self.playwright_manager.create_browser(headless=True)
+                logger.info("Playwright инициализирован")
+                self.use_playwright = True
+            except Exception as e:
+                logger.warning(f"Не удалось инициализировать Playwright: {e}")
+                # Fallback на Selenium
+                logger.info("Переключаемся на Selenium как fallback...")
+                self.selenium_manager.create_driver(headless=True)
+                logger.info("WebDriver (Selenium) инициализирован")
+                self.use_playwright = False
+        else:
+            # Playwright недоступен, используем Selenium
+            logger.info("Playwright недоступен, используем Selenium...")
+            self.selenium_manager.create_driver(headless=True)
+            logger.info("WebDriver (Selenium) инициализирован")
+            self.use_playwright = False
+
+        self.browser_ready = True
+
+    def _extract_products_from_content(self, json_content: str, page_num: int) -> List[ProductInfo]:
+        """
+        Разбирает JSON ответа API и извлекает товары.
+
+        Args:
+            json_content: JSON ответа API
+            page_num: Номер страницы (первая сохраняется для отладки)
+
+        Returns:
+            Список товаров
+
+        Raises:
+            json.JSONDecodeError: если ответ не является JSON (ijson.JSONError при потоковом разборе)
+        """
+        if page_num != 1:
+            return self._extract_products_from_json(self._iter_widget_states(json_content))
+
+        data = json_loads(json_content)
+
+        # Сохраняем пример JSON для отладки (только первая страница)
+        debug_file = Settings.PROJECT_ROOT / f'debug_page_{page_num}.json'
+        try:
+            if HAS_ORJSON:
+                # orjson кодирует в UTF-8 без экранирования и в разы быстрее json.dump
+                debug_file.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            else:
+                with open(debug_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+            logger.info(f"Пример JSON сохранен в {debug_file} для отладки")
+        except Exception as e:
+            logger.debug(f"Не удалось сохранить debug JSON: {e}")
+
+        return self._extract_products_from_json(data.get('widgetStates', {}).items())
+
+    def _create_http_session(self):
+        """
+        Создает постоянную HTTP-сессию для запросов к API.
+
+        С httpx все страницы идут по одному HTTP/2 соединению, иначе
+        используется пул keep-alive соединений requests.
+
+        Returns:
+            httpx.Client или requests.Session
+        """
+        session = httpx.Client(http2=True) if HAS_HTTPX else requests.Session()
+        session.headers.update({
+            'User-Agent': Settings.USER_AGENT_MOBILE,
+            'Accept': 'application/json',
+            'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+        })
+
+        self.http_executor = ThreadPoolExecutor(max_workers=Settings.MAX_WORKERS, thread_name_prefix="HTTP")
+        logger.info(f"HTTP-сессия создана, страницы загружаются параллельно по {Settings.MAX_WORKERS}")
+        return session
+
+    def _load_browser_cookies(self):
+        """Передает в HTTP-сессию cookies браузера, прошедшего анти-бот проверку"""
+        manager = self.playwright_manager if self.use_playwright else self.selenium_manager
+        cookies = manager.get_cookies()
+        for cookie in cookies:
+            self.http_session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+
+        self.http_cookies_from_browser = True
+        logger.info(f"HTTP: получено {len(cookies)} cookies браузера, повторяем запросы по HTTP")
+
+    def _close_http_session(self):
+        """Закрывает HTTP-сессию и отключает загрузку страниц по HTTP"""
+        self._cancel_http_pages()
+        if self.http_executor:
+            # Дожидаемся уже начатых запросов, чтобы не закрыть сессию под ними
+            self.http_executor.shutdown(wait=True)
+            self.http_executor = None
+        if self.http_session:
+            self.http_session.close()
+            self.http_session = None
+        self.use_http = False
+
+    def _schedule_http_pages(self, page_num: int, max_pages: int):
+        """
+        Ставит в фоновую загрузку по HTTP окно из Settings.MAX_WORKERS страниц,
+        начиная с текущей, пока текущая страница обрабатывается.
+
+        Args:
+            page_num: Текущая страница
+            max_pages: Максимальный номер страницы
+        """
+        for page in range(page_num, min(page_num + Settings.MAX_WORKERS, max_pages + 1)):
+            if page not in self.http_pending:
+                self.http_pending[page] = self.http_executor.submit(self._fetch_page_via_http, page)
+
+    def _cancel_http_pages(self):
+        """Отменяет еще не начатые фоновые HTTP-запросы страниц"""
+        for future in self.http_pending.values():
+            future.cancel()
+        self.http_pending.clear()
+
+    def _check_http_forbidden(self):
+        """Реагирует на 403 от API: ждет cookies браузера или отключает HTTP"""
+        if not self.http_forbidden:
+            return
+
+        self.http_forbidden = False
+        if self.http_cookies_from_browser:
+            logger.warning("HTTP: доступ запрещен (403), дальше страницы загружаются через браузер")
+            self._close_http_session()
+        else:
+            logger.info("HTTP: доступ запрещен (403), ждем cookies браузера")
+
+    def _fetch_page_via_http(self, page_num: int) -> Optional[List[ProductInfo]]:
+        """
+        Загружает страницу API обычным HTTP-запросом без браузера.
+
+        Args:
+            page_num: Номер страницы
+
+        Returns:
+            Список товаров или None, если ответ не разобран или товаров нет
+            (такую страницу нужно проверить через браузер)
+        """
+        self.http_rate_limiter.acquire()
+        try:
+            response = self.http_session.get(self._build_api_url(page_num), timeout=Settings.API_REQUEST_TIMEOUT)
+        except HTTP_ERRORS as e:
+            logger.debug(f"HTTP-запрос страницы {page_num} не удался: {e}")
+            return None
+
+        if response.status_code != 200:
+            logger.debug(f"HTTP-запрос страницы {page_num}: статус {response.status_code}")
+            if response.status_code == 403:
+                self.http_forbidden = True
+            return None
+
+        try:
+            products = self._extract_products_from_content(response.text, page_num)
+        except JSON_ERRORS as e:
+            logger.debug(f"HTTP-ответ страницы {page_num} не является JSON: {e}")
+            return None
+
+        return products or None
+
     def _check_if_blocked(self) -> bool:
         """
         Проверяет, заблокирован ли доступ.
@@ -259,6 +572,9 @@ class OzonAPIParser:
         Returns:
             True если обнаружена блокировка
         """
+        if not self.browser_ready:
+            return False
+
         manager = self.playwright_manager if self.use_playwright else self.selenium_manager
         return manager.is_page_blocked()
 
@@ -269,9 +585,7 @@ class OzonAPIParser:
         Returns:
             True если есть непроверенные альтернативные endpoints
         """
-        all_endpoints = [Settings.OZON_API_BASE_MOBILE, Settings.OZON_API_BASE_DESKTOP]
-        untried = [ep for ep in all_endpoints if ep not in self.tried_endpoints]
-        return len(untried) > 0
+        return any(ep not in self.tried_endpoints for ep in ALL_API_ENDPOINTS)
 
     def _switch_to_alternative_endpoint(self) -> bool:
         """
@@ -280,23 +594,17 @@ class OzonAPIParser:
         Returns:
             True если переключение успешно, False если нет альтернатив
         """
-        all_endpoints = [Settings.OZON_API_BASE_MOBILE, Settings.OZON_API_BASE_DESKTOP]
-
         # Помечаем текущий endpoint как попробованный
-        if self.current_api_endpoint not in self.tried_endpoints:
-            self.tried_endpoints.append(self.current_api_endpoint)
+        self.tried_endpoints.add(self.current_api_endpoint)
 
         # Ищем непроверенный endpoint
-        for endpoint in all_endpoints:
+        for endpoint in ALL_API_ENDPOINTS:
             if endpoint not in self.tried_endpoints:
                 old_endpoint = self.current_api_endpoint
                 self.current_api_endpoint = endpoint
                 self.api_endpoint_failures = 0
 
-                endpoint_name = "Mobile API" if endpoint == Settings.OZON_API_BASE_MOBILE else "Desktop API"
-                old_name = "Mobile API" if old_endpoint == Settings.OZON_API_BASE_MOBILE else "Desktop API"
-
-                logger.warning(f"🔄 Переключаемся с {old_name} на {endpoint_name}")
+                logger.warning(f"🔄 Переключаемся с {API_ENDPOINT_NAMES[old_endpoint]} на {API_ENDPOINT_NAMES[endpoint]}")
                 logger.info(f"   Старый: {old_endpoint}")
                 logger.info(f"   Новый:  {endpoint}")
 
@@ -315,51 +623,70 @@ class OzonAPIParser:
         Returns:
             Полный URL API
         """
-        # Убираем https://www.ozon.ru из seller_url
-        seller_path = self.seller_url.replace(Settings.OZON_BASE_URL, '')
-
-        # Добавляем page параметр если нужно
+        # Добавляем page параметр если нужно (путь уже URL-кодирован)
+        encoded_path = self.encoded_seller_path
         if page_num > 1:
-            if '?' in seller_path:
-                seller_path += f'&page={page_num}'
-            else:
-                seller_path += f'?page={page_num}'
+            encoded_path = f"{encoded_path}{self.encoded_page_prefix}{page_num}"
 
-        # Формируем полный API URL с URL-encoding параметра url
         # Используем текущий активный endpoint
-        encoded_path = quote(seller_path, safe='')
         api_url = f"{self.current_api_endpoint}?url={encoded_path}&__rr=1"
 
-        endpoint_name = "Mobile" if self.current_api_endpoint == Settings.OZON_API_BASE_MOBILE else "Desktop"
-        logger.debug(f"Seller path: {seller_path}")
-        logger.debug(f"API endpoint: {endpoint_name}")
-        logger.debug(f"API URL: {api_url}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Seller path: {self.seller_path}")
+            logger.debug(f"API endpoint: {API_ENDPOINT_NAMES[self.current_api_endpoint]}")
+            logger.debug(f"API URL: {api_url}")
         return api_url
 
-    def _extract_products_from_json(self, data: dict) -> List[ProductInfo]:
+    @staticmethod
+    def _iter_widget_states(json_content: str) -> Iterator[Tuple[str, Any]]:
         """
-        Извлекает товары из JSON ответа API.
+        Перебирает пары (ключ, значение) из widgetStates ответа API.
+
+        С ijson документ разбирается потоково и целиком в памяти не строится,
+        иначе разбирается целиком через json_loads.
 
         Args:
-            data: Распарсенный JSON
+            json_content: JSON ответа API
 
         Returns:
-            Список товаров
+            Итератор пар (ключ виджета, состояние виджета)
+        """
+        if HAS_IJSON:
+            return ijson.kvitems(io.BytesIO(json_content.encode('utf-8')), 'widgetStates', use_float=True)
+        return iter(json_loads(json_content).get('widgetStates', {}).items())
+
+    def _extract_products_from_json(self, widget_states: Iterable[Tuple[str, Any]]) -> List[ProductInfo]:
+        """
+        Извлекает товары из виджетов ответа API.
+
+        Args:
+            widget_states: Пары (ключ виджета, состояние виджета) из widgetStates
+
+        Returns:
+            Список товаров без повторов SKU
         """
         products = []
-        widget_states = data.get('widgetStates', {})
+        seen_skus = set()
+        is_product_widget = RE_PRODUCT_WIDGET_KEY.search
 
         # Ищем виджеты с товарами
         # Возможные ключи: searchResultsV2, webCurrentSeller, webSearchResult, productTile
-        for key, value in widget_states.items():
-            if any(pattern in key.lower() for pattern in ['searchresult', 'seller', 'product', 'tile']):
+        for key, value in widget_states:
+            if is_product_widget(key):
+                # Виджет без массива товаров (напр. шапка продавца) не декодируем
+                if isinstance(value, str) and not any(marker in value for marker in WIDGET_ITEMS_MARKERS):
+                    continue
+
                 try:
                     # value может быть строкой (JSON) или уже dict
-                    widget_data = json.loads(value) if isinstance(value, str) else value
+                    widget_data = json_loads(value) if isinstance(value, str) else value
 
-                    # Извлекаем товары из виджета
-                    items = self._extract_items_from_widget(widget_data)
-                    products.extend(items)
+                    # Извлекаем товары из виджета, пропуская уже найденные в других виджетах.
+                    # Порядок виджетов в ответе не гарантирован, поэтому просматриваются все
+                    for product in self._extract_items_from_widget(widget_data):
+                        if product.sku not in seen_skus:
+                            seen_skus.add(product.sku)
+                            products.append(product)
 
                 except Exception as e:
                     logger.debug(f"Пропуск виджета {key}: {e}")
@@ -378,26 +705,16 @@ class OzonAPIParser:
         Returns:
             Список товаров
         """
-        products = []
-
-        # Ищем массив items в различных местах структуры
-        items = widget_data.get('items', [])
-
-        # Если items пустой, пробуем другие варианты
-        if not items:
-            # Иногда товары в products
-            items = widget_data.get('products', [])
+        # Ищем массив товаров: items, иногда products или state.items
+        state = widget_data.get('state')
+        items = (
+            widget_data.get('items') or
+            widget_data.get('products') or
+            (state.get('items') if isinstance(state, dict) else None) or
+            ()
+        )
 
-        # Иногда items внутри вложенных объектов
-        if not items and 'state' in widget_data:
-            items = widget_data['state'].get('items', [])
-
-        for item in items:
-            product = self._parse_product_item(item)
-            if product:
-                products.append(product)
-
-        return products
+        return [product for product in map(self._parse_product_item, items) if product]
 
     def _parse_product_item(self, item: dict) -> Optional[ProductInfo]:
         """
@@ -411,15 +728,15 @@ class OzonAPIParser:
         """
         try:
             # SKU/артикул
-            sku = str(item.get('sku', item.get('id', '')))
+            sku = to_str(item.get('sku') or item.get('id'))
             if not sku:
                 return None
 
             # Название
-            name = item.get('name', item.get('title', ''))
+            name = item.get('name') or item.get('title') or ''
 
             # Ссылка
-            link = item.get('link', item.get('url', ''))
+            link = item.get('link') or item.get('url') or ''
             if link and not link.startswith('http'):
                 link = Settings.OZON_BASE_URL + link
 
@@ -428,86 +745,56 @@ class OzonAPIParser:
             original_price = ''
 
             # Вариант 1: объект price
-            price_info = item.get('price', {})
+            price_info = item.get('price')
             if isinstance(price_info, dict):
-                # НОВАЯ СТРУКТУРА: price.price[0].text
+                # НОВАЯ СТРУКТУРА: price.price[0].text, старая цена - во втором элементе
                 price_array = price_info.get('price')
-                if isinstance(price_array, list) and len(price_array) > 0:
-                    # Извлекаем текст цены из первого элемента массива
-                    price_obj = price_array[0]
-                    if isinstance(price_obj, dict):
-                        current_price = price_obj.get('text', '')
-
-                    # Старая цена может быть во втором элементе или отдельном поле
-                    if len(price_array) > 1:
-                        old_price_obj = price_array[1]
-                        if isinstance(old_price_obj, dict):
-                            original_price = old_price_obj.get('text', '')
+                if isinstance(price_array, list):
+                    if price_array and isinstance(price_array[0], dict):
+                        current_price = price_array[0].get('text', '')
+                    if len(price_array) > 1 and isinstance(price_array[1], dict):
+                        original_price = price_array[1].get('text', '')
 
                 # Если не нашли через массив, пробуем старые варианты
-                if not current_price:
-                    # Пробуем разные поля для текущей цены
-                    current_price = (
-                        price_info.get('text') or
-                        price_info.get('current') or
-                        price_info.get('finalPrice') or
-                        price_info.get('displayPrice') or
-                        ''
-                    )
-
-                # Пробуем разные поля для старой цены
-                if not original_price:
-                    original_price = (
-                        price_info.get('originalPrice') or
-                        price_info.get('original') or
-                        price_info.get('ozonCardPrice') or
-                        ''
-                    )
-
-                # Конвертируем в строку если это число
-                if isinstance(current_price, (int, float)):
-                    current_price = f"{current_price} ₽"
-                if isinstance(original_price, (int, float)):
-                    original_price = f"{original_price} ₽"
+                current_price = current_price or first_value(price_info, CURRENT_PRICE_KEYS)
+                original_price = original_price or first_value(price_info, ORIGINAL_PRICE_KEYS)
 
             elif isinstance(price_info, (str, int, float)):
-                current_price = str(price_info)
-                if isinstance(price_info, (int, float)):
-                    current_price = f"{current_price} ₽"
+                current_price = format_price(price_info)
 
             # Вариант 2: прямые поля в item
-            if not current_price:
-                current_price = item.get('finalPrice', item.get('displayPrice', ''))
-                if isinstance(current_price, (int, float)):
-                    current_price = f"{current_price} ₽"
+            current_price = current_price or first_value(item, ITEM_PRICE_KEYS)
 
             # Логируем если цена не найдена
-            if not current_price:
+            if not current_price and logger.isEnabledFor(logging.DEBUG):
                 logger.debug(f"Цена не найдена для товара {sku}. Доступные ключи: {list(item.keys())[:10]}")
 
-            current_price = str(current_price)
-            original_price = str(original_price)
+            current_price = format_price(current_price)
+            original_price = format_price(original_price)
 
             # Изображение
-            image_url = item.get('image', item.get('coverImage', item.get('img', '')))
-            if isinstance(image_url, dict):
-                image_url = image_url.get('src', '')
+            image = item.get('image') or item.get('coverImage') or item.get('img') or ''
+            image_url = image.get('src', '') if isinstance(image, dict) else image
 
             # Рейтинг и отзывы
-            rating = str(item.get('rating', ''))
-            reviews_count = str(item.get('reviewsCount', item.get('reviews', '')))
+            rating = to_str(item.get('rating'))
+            reviews_count = item.get('reviewsCount')
+            if reviews_count is None:
+                reviews_count = item.get('reviews')
+            reviews_count = to_str(reviews_count)
 
-            # Бренд и категория
-            brand = item.get('brand', '')
-            category = item.get('category', '')
+            # Бренд, категория и продавец повторяются у множества товаров магазина -
+            # интернируем, чтобы все товары ссылались на одну строку
+            brand = sys.intern(to_str(item.get('brand')))
+            category = sys.intern(to_str(item.get('category')))
 
             # Продавец
             seller_name = ''
             seller_inn = ''
             seller_info = item.get('seller', {})
             if isinstance(seller_info, dict):
-                seller_name = seller_info.get('name', '')
-                seller_inn = seller_info.get('inn', '')
+                seller_name = sys.intern(to_str(seller_info.get('name')))
+                seller_inn = sys.intern(to_str(seller_info.get('inn')))
 
             product = ProductInfo(
                 sku=sku,
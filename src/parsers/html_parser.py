@@ -4,17 +4,18 @@
 """
 
 import re
+import sys
+import gzip
 import json
-import time
-import random
 import logging
-from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
+from dataclasses import dataclass
 from pathlib import Path
 
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
 from selenium.common.exceptions import TimeoutException
 
 try:
@@ -31,12 +32,31 @@ try:
 except ImportError:
     HAS_BS4 = False
 
+# lxml (C-парсер libxml2) заметно быстрее встроенного html.parser
+try:
+    import lxml  # noqa: F401
+    BS4_PARSER = 'lxml'
+except ImportError:
+    BS4_PARSER = 'html.parser'
+
+# selectolax (биндинг к C-парсеру lexbor) не строит граф Python-объектов на каждый узел
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    HAS_SELECTOLAX = False
+
 from src.config.settings import Settings
+from src.utils.fast_regex import compile_fast
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+# __slots__ у dataclass доступны с Python 3.10
+DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**DATACLASS_SLOTS)
 class ProductInfo:
     """Информация о товаре"""
     sku: str
@@ -56,7 +76,37 @@ class ProductInfo:
 
     def to_dict(self) -> dict:
         """Преобразует в словарь"""
-        return asdict(self)
+        # Все поля - str/bool, поэтому глубокое копирование asdict не нужно
+        return {
+            'sku': self.sku,
+            'name': self.name,
+            'current_price': self.current_price,
+            'original_price': self.original_price,
+            'link': self.link,
+            'image_url': self.image_url,
+            'rating': self.rating,
+            'reviews_count': self.reviews_count,
+            'seller_name': self.seller_name,
+            'seller_inn': self.seller_inn,
+            'category': self.category,
+            'brand': self.brand,
+            'success': self.success,
+            'error': self.error,
+        }
+
+
+@lru_cache(maxsize=4096)
+def clean_text(s: str) -> str:
+    """
+    Очищает текст от лишних символов.
+
+    Кэшируется: одни и те же цены ("1 299 ₽") повторяются на странице много раз.
+    """
+    if not s:
+        return ''
+    # str.split() без аргументов режет по любым Unicode-пробелам,
+    # включая \u00A0, \u2009 и \u202F, и отбрасывает их по краям
+    return ' '.join(s.split())
 
 
 class OzonHTMLParser:
@@ -67,10 +117,101 @@ class OzonHTMLParser:
     и BeautifulSoup для извлечения данных.
     """
 
-    # Регулярные выражения
-    RE_PRODUCT_ID = re.compile(r'/product/[^\"\'>]*-(\d+)', re.IGNORECASE)
-    RE_PRICE = re.compile(r'[\d\u00A0\u2009\u202F]+(?:\u2009| )?₽')
-    RE_SKU = re.compile(r'\"sku\"\s*:\s*(\d+)')
+    # Регулярные выражения (сканируют весь HTML, поэтому через compile_fast).
+    # В RE_PRICE пробелы заданы самими символами, а не escape-последовательностями \u,
+    # которые не понимает синтаксис re2.
+    RE_PRODUCT_ID = compile_fast(r'/product/[^\"\'>]*-(\d+)', re.IGNORECASE)
+    RE_PRICE = compile_fast('[\\d\u00A0\u2009\u202F]+(?:\u2009| )?₽')
+    RE_SKU = compile_fast(r'\"sku\"\s*:\s*(\d+)')
+    RE_NAME_ALT = compile_fast(r'alt=\"([^\"]{5,300}?)\"')
+    RE_NAME_TITLE = compile_fast(r'title=\"([^\"]{5,300}?)\"')
+
+    # Ссылки на товары отбираются селектором, RE_PRODUCT_ID только извлекает id
+    PRODUCT_LINK_SELECTOR = 'a[href*="/product/"]'
+
+    # Ресурсы, которые браузеру не нужно загружать
+    BLOCKED_URL_PATTERNS = [
+        '*.jpg', '*.jpeg', '*.png', '*.webp', '*.gif', '*.svg',
+        '*.woff', '*.woff2', '*.ttf',
+        '*.mp4', '*.webm',
+        '*google-analytics*', '*googletagmanager*', '*doubleclick*', '*mc.yandex*',
+    ]
+
+    # Состояние загруженной страницы: null пока идет проверка CloudFlare
+    # или товары еще не отрисованы, иначе 'empty' или 'products'
+    PAGE_STATE_SCRIPT = """
+        const text = document.body ? document.body.innerText : '';
+        if (text.includes('Пожалуйста, дождитесь окончания проверки')) {
+            return null;
+        }
+        if (text.includes('ничего не нашлось')) {
+            return 'empty';
+        }
+        return document.querySelector('a[href*="/product/"]') ? 'products' : null;
+    """
+
+    # Бесконечный скролл внутри страницы.
+    # Аргументы: пауза (мс), мин. и макс. шаг (px), таймаут без новых товаров (мс),
+    # лимит попыток; последний аргумент - callback Selenium.
+    SCROLL_SCRIPT = """
+        const [pause, stepMin, stepMax, maxWait, maxAttempts] = arguments;
+        const done = arguments[arguments.length - 1];
+
+        // Уникальные товары по SKU в URL. Страница сканируется один раз,
+        // дальше в набор попадают только добавленные в DOM узлы
+        const uniqueProducts = new Set();
+        const addLinks = root => {
+            const links = root.matches && root.matches('a[href*="/product/"]')
+                ? [root]
+                : root.querySelectorAll('a[href*="/product/"]');
+            links.forEach(link => {
+                const match = link.href.match(/\\/product\\/[^\\/-]+-(\\d+)/);
+                if (match && match[1]) {
+                    uniqueProducts.add(match[1]);
+                }
+            });
+        };
+        addLinks(document);
+        const observer = new MutationObserver(mutations => {
+            for (const mutation of mutations) {
+                for (const node of mutation.addedNodes) {
+                    if (node.querySelectorAll) {
+                        addLinks(node);
+                    }
+                }
+            }
+        });
+        observer.observe(document.body, {childList: true, subtree: true});
+
+        const finish = () => {
+            observer.disconnect();
+            done({attempts: attempts, count: lastCount});
+        };
+
+        let lastCount = 0;
+        let lastChange = Date.now();
+        let attempts = 0;
+
+        (function step() {
+            const scrollStep = stepMin + Math.floor(Math.random() * (stepMax - stepMin + 1));
+            window.scrollBy(0, scrollStep);
+
+            setTimeout(() => {
+                const count = uniqueProducts.size;
+                attempts += 1;
+                if (count > lastCount) {
+                    lastCount = count;
+                    lastChange = Date.now();
+                } else if (Date.now() - lastChange >= maxWait) {
+                    return finish();
+                }
+                if (attempts >= maxAttempts) {
+                    return finish();
+                }
+                step();
+            }, pause);
+        })();
+    """
 
     def __init__(self, seller_url: str, headless: bool = True):
         """
@@ -89,6 +230,7 @@ class OzonHTMLParser:
         self.headless = headless
         self.driver: Optional[Chrome] = None
         self.products: List[ProductInfo] = []
+        self.debug_thread: Optional[threading.Thread] = None
 
         if not self.seller_id:
             logger.warning(f"Не удалось извлечь ID продавца из URL: {seller_url}")
@@ -96,6 +238,9 @@ class OzonHTMLParser:
     def _create_driver(self) -> Chrome:
         """Создает undetected Chrome driver"""
         options = ChromeOptions()
+        # driver.get() возвращается после построения DOM, не дожидаясь картинок
+        # и сторонних скриптов; готовность страницы проверяет PAGE_STATE_SCRIPT
+        options.page_load_strategy = 'eager'
 
         if self.headless:
             options.add_argument("--headless=new")
@@ -110,11 +255,21 @@ class OzonHTMLParser:
             "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36"
         )
         options.add_experimental_option("prefs", {
-            "profile.default_content_setting_values.notifications": 2
+            "profile.default_content_setting_values.notifications": 2,
+            # Картинки не нужны для разбора HTML (см. также BLOCKED_URL_PATTERNS)
+            "profile.managed_default_content_settings.images": 2
         })
         options.add_argument("--disable-blink-features=AutomationControlled")
 
         driver = Chrome(options=options, version_main=Settings.CHROME_VERSION)
+
+        # Картинки, шрифты и видео не нужны для разбора HTML (<img alt> остается в DOM)
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            logger.warning(f"Не удалось включить блокировку ресурсов: {e}")
+
         logger.info(f"Создан undetected-chromedriver (headless={self.headless})")
         return driver
 
@@ -156,6 +311,8 @@ class OzonHTMLParser:
             if self.driver:
                 self.driver.quit()
                 logger.info("WebDriver закрыт")
+            if self.debug_thread:
+                self.debug_thread.join()
 
     def _parse_page(self, page_num: int) -> List[ProductInfo]:
         """
@@ -176,37 +333,19 @@ class OzonHTMLParser:
             self.driver.get(current_url)
             logger.info(f"✅ Страница загружена: {current_url}")
 
-            # Ждем загрузки
-            time.sleep(5)
-
-            # Проверяем на экран проверки CloudFlare
+            # Ждем, пока пройдет проверка CloudFlare и появятся товары
+            # или сообщение о пустой странице - без фиксированных пауз
             try:
-                WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, "//*[contains(text(), 'Пожалуйста, дождитесь окончания проверки')]")
-                    )
+                page_state = WebDriverWait(self.driver, Settings.ANTI_BOT_WAIT_TIMEOUT).until(
+                    lambda d: d.execute_script(self.PAGE_STATE_SCRIPT)
                 )
-                logger.info("🔒 Обнаружен экран проверки CloudFlare, ждем...")
-                WebDriverWait(self.driver, 60).until_not(
-                    EC.presence_of_element_located(
-                        (By.XPATH, "//*[contains(text(), 'Пожалуйста, дождитесь окончания проверки')]")
-                    )
-                )
-                logger.info("✅ Проверка CloudFlare завершена")
             except TimeoutException:
-                logger.debug("Экран проверки не обнаружен, продолжаем")
+                page_state = None
+                logger.warning("Страница не дошла до готового состояния, продолжаем с тем что есть")
 
-            # Проверяем на пустую страницу
-            try:
-                WebDriverWait(self.driver, 5).until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, "//*[contains(text(), 'ничего не нашлось')]")
-                    )
-                )
+            if page_state == 'empty':
                 logger.info(f"Страница {page_num} пустая (нет товаров)")
                 return []
-            except TimeoutException:
-                pass  # Страница с товарами
 
             # Скроллим страницу для загрузки всех товаров
             logger.info("🔄 Начинаем скролл страницы...")
@@ -222,19 +361,27 @@ class OzonHTMLParser:
             page_source = self.driver.page_source
             logger.info(f"✅ HTML получен, размер: {len(page_source)} байт")
 
-            # Сохраняем HTML первой страницы для отладки
-            if page_num == 1:
-                debug_file = Settings.PROJECT_ROOT / f'debug_html_page_{page_num}.html'
-                try:
-                    with open(debug_file, 'w', encoding='utf-8') as f:
-                        f.write(page_source)
-                    logger.info(f"💾 HTML первой страницы сохранен в {debug_file} для отладки")
-                except Exception as e:
-                    logger.warning(f"Не удалось сохранить debug HTML: {e}")
+            # Сохраняем HTML первой страницы для отладки (если включено)
+            # в фоновом потоке, чтобы запись на диск не задерживала парсинг
+            if page_num == 1 and Settings.DEBUG_SAVE_HTML:
+                debug_file = Settings.PROJECT_ROOT / f'debug_html_page_{page_num}.html.gz'
+                self.debug_thread = threading.Thread(
+                    target=self._save_debug_html,
+                    args=(debug_file, page_source),
+                    name="DebugHTML"
+                )
+                self.debug_thread.start()
+
+            # Без единой ссылки на товар строить DOM-дерево бессмысленно
+            if not self.RE_PRODUCT_ID.search(page_source):
+                logger.warning("В HTML нет ссылок на товары, парсинг пропущен")
+                return []
 
             # Парсим HTML
             logger.info("🔍 Начинаем парсинг HTML...")
-            if HAS_BS4:
+            if HAS_SELECTOLAX:
+                products = self._parse_html_with_selectolax(page_source)
+            elif HAS_BS4:
                 products = self._parse_html_with_bs4(page_source)
             else:
                 products = self._parse_html_fallback(page_source)
@@ -246,12 +393,32 @@ class OzonHTMLParser:
             logger.error(f"❌ Критическая ошибка в _parse_page: {type(e).__name__}: {e}", exc_info=True)
             return []
 
+    @staticmethod
+    def _save_debug_html(debug_file: Path, page_source: str):
+        """
+        Сохраняет HTML страницы для отладки в gzip.
+
+        Быстрый уровень сжатия: HTML прокрученной ленты занимает десятки МБ.
+
+        Args:
+            debug_file: Путь к файлу
+            page_source: HTML страницы
+        """
+        try:
+            with gzip.open(debug_file, 'wt', encoding='utf-8', compresslevel=1) as f:
+                f.write(page_source)
+            logger.info(f"💾 HTML первой страницы сохранен в {debug_file} для отладки")
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить debug HTML: {e}")
+
     def _scroll_page(self):
         """
         Скроллит бесконечную ленту Ozon до конца.
 
         Продолжает скролл пока появляются новые товары.
         Останавливается если товары не появляются определенное время (настраивается в config.json).
+        Весь цикл скролла выполняется внутри страницы одним execute_async_script,
+        без обмена с драйвером на каждом шаге.
         """
         try:
             # Загружаем настройки скролла из config.json
@@ -267,69 +434,25 @@ class OzonHTMLParser:
             logger.info("🔄 Начинаем бесконечный скролл для загрузки всех товаров...")
             logger.info(f"   Настройки: пауза {scroll_pause}с, шаг {scroll_step_min}-{scroll_step_max}px, таймаут {max_wait_seconds}с")
 
-            last_product_count = 0
-            last_change_time = time.time()
-            scroll_attempts = 0
-
-            logger.info("   Начальный подсчет товаров на странице...")
-
-            while scroll_attempts < max_scroll_attempts:
-                try:
-                    # Скроллим вниз
-                    scroll_step = random.randint(scroll_step_min, scroll_step_max)
-                    self.driver.execute_script(f"window.scrollBy(0, {scroll_step});")
-
-                    # Пауза для загрузки контента (настраивается в config.json)
-                    time.sleep(scroll_pause)
-
-                    # Считаем текущее количество товаров на странице
-                    # Используем специфичные селекторы для Ozon
-                    current_product_count = self.driver.execute_script("""
-                        // Считаем ссылки на товары Ozon
-                        const productLinks = document.querySelectorAll('a[href*="/product/"]');
-
-                        // Фильтруем уникальные товары по SKU в URL
-                        const uniqueProducts = new Set();
-                        productLinks.forEach(link => {
-                            const match = link.href.match(/\\/product\\/[^\\/-]+-(\\d+)/);
-                            if (match && match[1]) {
-                                uniqueProducts.add(match[1]);
-                            }
-                        });
-
-                        return uniqueProducts.size;
-                    """)
-
-                    # Проверяем появились ли новые товары
-                    current_time = time.time()
-                    elapsed_since_change = current_time - last_change_time
-
-                    if current_product_count > last_product_count:
-                        logger.info(f"   Загружено товаров: {current_product_count} (+{current_product_count - last_product_count})")
-                        last_product_count = current_product_count
-                        last_change_time = current_time  # Обновляем время последнего изменения
-                    else:
-                        # Если товары не появляются больше max_wait_seconds секунд
-                        if elapsed_since_change >= max_wait_seconds:
-                            logger.info(f"✅ Скролл завершен: {max_wait_seconds} секунд без новых товаров")
-                            logger.info(f"   Всего загружено уникальных товаров: {current_product_count}")
-                            break
-
-                    scroll_attempts += 1
-
-                    # Логируем каждые 20 попыток для отслеживания прогресса
-                    if scroll_attempts % 20 == 0:
-                        logger.info(f"   Скролл #{scroll_attempts}: товаров {current_product_count}, времени без изменений: {elapsed_since_change:.1f}с")
-
-                except Exception as e:
-                    logger.warning(f"⚠️ Ошибка во время скролла (попытка {scroll_attempts}): {type(e).__name__}: {e}")
-                    # Продолжаем скролл несмотря на ошибку
-                    scroll_attempts += 1
-                    if scroll_attempts >= max_scroll_attempts:
-                        break
+            # Скрипт должен успеть выполнить все попытки
+            self.driver.set_script_timeout(
+                max_scroll_attempts * scroll_pause + max_wait_seconds + 30
+            )
+            result = self.driver.execute_async_script(
+                self.SCROLL_SCRIPT,
+                int(scroll_pause * 1000),
+                scroll_step_min,
+                scroll_step_max,
+                int(max_wait_seconds * 1000),
+                max_scroll_attempts,
+            )
+            scroll_attempts = result['attempts']
+            last_product_count = result['count']
 
             if scroll_attempts >= max_scroll_attempts:
                 logger.warning(f"⚠️ Достигнут лимит попыток скролла ({max_scroll_attempts})")
+            else:
+                logger.info(f"✅ Скролл завершен: {max_wait_seconds} секунд без новых товаров")
 
             logger.info(f"📊 Скролл завершен за {scroll_attempts} попыток, найдено {last_product_count} товаров")
 
@@ -339,7 +462,7 @@ class OzonHTMLParser:
 
     def _parse_html_with_bs4(self, html: str) -> List[ProductInfo]:
         """Парсит HTML с помощью BeautifulSoup"""
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = BeautifulSoup(html, BS4_PARSER)
         items = {}
 
         # Исключаем блок "Возможно, вам понравится"
@@ -350,75 +473,136 @@ class OzonHTMLParser:
                 logger.info("🚫 Исключаем блок 'Возможно, вам понравится'")
                 block.decompose()  # Удаляем блок из DOM
 
+        # Соседние карточки делят общих предков: текст каждого узла собираем один раз
+        text_cache: Dict[int, str] = {}
+
+        def node_text(node) -> str:
+            text = text_cache.get(id(node))
+            if text is None:
+                text = text_cache[id(node)] = node.get_text(separator=' ', strip=True)
+            return text
+
         # Поиск по ссылкам на товары
-        for a in soup.find_all('a', href=True):
+        for a in soup.select(self.PRODUCT_LINK_SELECTOR):
             href = a['href']
             m = self.RE_PRODUCT_ID.search(href)
             if not m:
                 continue
 
             pid = m.group(1)
+            # У товара несколько ссылок (картинка, название): повторно
+            # разбираем только если по прежним ссылкам не нашлось название
+            if items.get(pid, {}).get('name'):
+                continue
 
             # Проверяем, не находится ли ссылка в блоке рекомендаций
-            # (дополнительная защита если блок не удалился)
-            parent_text = ''
-            check_parent = a.parent
+            # (дополнительная защита если блок не удалился).
+            # Текст предка включает текст всех потомков, поэтому достаточно
+            # одного get_text у самого верхнего из 5 родителей
+            top = a
             for _ in range(5):
-                if check_parent:
-                    parent_text = check_parent.get_text(separator=' ', strip=True)
-                    if 'Возможно, вам понравится' in parent_text:
-                        # Пропускаем этот товар
-                        break
-                    check_parent = check_parent.parent
-            else:
-                # Товар не в блоке рекомендаций, парсим его
-
-                # Название товара
-                name = self._clean_text(a.text)
-                if not name:
-                    img = a.find('img')
-                    if img and 'alt' in img.attrs:
-                        name = self._clean_text(img['alt'])
-
-                # Поиск цен в родителях
-                prices = []
-                container = a.parent
-                for _ in range(4):
-                    if container:
-                        text = container.get_text(separator=' ', strip=True)
-                        found_prices = self.RE_PRICE.findall(text)
-                        for p in found_prices:
-                            cleaned_p = self._clean_text(p)
-                            if cleaned_p and cleaned_p not in prices:
-                                prices.append(cleaned_p)
-                        container = container.parent
-
-                # Полная ссылка на товар
-                full_link = f"https://www.ozon.ru{href}" if not href.startswith('http') else href
-
-                items[pid] = {
-                    'name': name,
-                    'sku': pid,
-                    'prices': prices[:2],
-                    'link': full_link
-                }
+                if top.parent is None:
+                    break
+                top = top.parent
+            if top is not a and 'Возможно, вам понравится' in node_text(top):
+                # Пропускаем этот товар
+                continue
 
-        # Конвертируем в ProductInfo
-        products = []
-        for pid, data in items.items():
-            prices = data['prices']
-            product = ProductInfo(
-                sku=data['sku'],
-                name=data['name'],
-                current_price=prices[0] if len(prices) > 0 else '',
-                original_price=prices[1] if len(prices) > 1 else '',
-                link=data['link']
-            )
-            products.append(product)
+            # Название товара
+            name = self._clean_text(a.text)
+            if not name:
+                img = a.find('img')
+                if img and 'alt' in img.attrs:
+                    name = self._clean_text(img['alt'])
+
+            # Поиск цен в родителях: от ближайшего, пока не набралось две цены
+            prices = self._collect_prices(a.parent, node_text)
+
+            # Полная ссылка на товар
+            full_link = f"https://www.ozon.ru{href}" if not href.startswith('http') else href
+
+            items[pid] = {
+                'name': name,
+                'sku': pid,
+                'prices': prices,
+                'link': full_link
+            }
+
+        # Дерево BS4 содержит циклические ссылки parent/children и без разрыва
+        # дожидалось бы циклического сборщика мусора
+        soup.decompose()
+
+        products = self._items_to_products(items)
 
         logger.debug(f"BeautifulSoup: найдено {len(products)} товаров (исключая рекомендации)")
         return products
 
+    def _parse_html_with_selectolax(self, html: str) -> List[ProductInfo]:
+        """Парсит HTML с помощью selectolax (lexbor)"""
+        tree = LexborHTMLParser(html)
+        items = {}
+
+        # Исключаем блок "Возможно, вам понравится"
+        for block in tree.css('div[class*="im8_24"]'):
+            if 'Возможно, вам понравится' in block.text():
+                logger.info("🚫 Исключаем блок 'Возможно, вам понравится'")
+                block.decompose()
+
+        # Обертки Node создаются заново при каждом обращении,
+        # поэтому кэш текста ключуется адресом узла в lexbor (mem_id)
+        text_cache: Dict[int, str] = {}
+
+        def node_text(node) -> str:
+            text = text_cache.get(node.mem_id)
+            if text is None:
+                text = text_cache[node.mem_id] = node.text(separator=' ', strip=True)
+            return text
+
+        # Поиск по ссылкам на товары
+        for a in tree.css(self.PRODUCT_LINK_SELECTOR):
+            href = a.attributes.get('href') or ''
+            m = self.RE_PRODUCT_ID.search(href)
+            if not m:
+                continue
+
+            pid = m.group(1)
+            # Товар уже разобран по другой ссылке
+            if items.get(pid, {}).get('name'):
+                continue
+
+            # Дополнительная защита, если блок рекомендаций не удалился
+            top = a
+            for _ in range(5):
+                if top.parent is None:
+                    break
+                top = top.parent
+            if top is not a and 'Возможно, вам понравится' in node_text(top):
+                continue
+
+            # Название товара
+            name = self._clean_text(a.text())
+            if not name:
+                img = a.css_first('img')
+                if img is not None:
+                    name = self._clean_text(img.attributes.get('alt') or '')
+
+            # Поиск цен в родителях
+            prices = self._collect_prices(a.parent, node_text)
+
+            full_link = f"https://www.ozon.ru{href}" if not href.startswith('http') else href
+
+            items[pid] = {
+                'name': name,
+                'sku': pid,
+                'prices': prices,
+                'link': full_link
+            }
+
+        products = self._items_to_products(items)
+
+        logger.debug(f"selectolax: найдено {len(products)} товаров (исключая рекомендации)")
+        return products
+
     def _parse_html_fallback(self, html: str) -> List[ProductInfo]:
         """Парсит HTML с помощью регулярных выражений (fallback)"""
 
@@ -436,22 +620,36 @@ class OzonHTMLParser:
 
         items = {}
 
+        # Названия и цены находятся одним проходом по всему HTML,
+        # а для каждого товара выбираются из окна ±2000 символов через bisect
+        alts = self._find_spans(self.RE_NAME_ALT, html, 1)
+        titles = self._find_spans(self.RE_NAME_TITLE, html, 1)
+        price_spans = self._find_spans(self.RE_PRICE, html, 0)
+        price_starts = [span[0] for span in price_spans]
+
         for m in self.RE_PRODUCT_ID.finditer(html):
             pid = m.group(1)
-            start, end = m.start(), m.end()
-            window = html[max(0, start - 2000): end + 2000]
+            # Товар уже разобран по другой ссылке
+            if items.get(pid, {}).get('name'):
+                continue
+            lo, hi = max(0, m.start() - 2000), m.end() + 2000
 
             # Название
-            name_match = (
-                re.search(r'alt=\"([^\"]{5,300}?)\"', window) or
-                re.search(r'title=\"([^\"]{5,300}?)\"', window)
-            )
-            name = self._clean_text(name_match.group(1)) if name_match else ''
+            name = self._first_in_window(alts, lo, hi) or self._first_in_window(titles, lo, hi)
+            name = self._clean_text(name) if name else ''
 
             # Цены
-            prices = [self._clean_text(p) for p in self.RE_PRICE.findall(window)]
-            seen = set()
-            prices = [p for p in prices if p and p not in seen and not seen.add(p)][:2]
+            prices: Dict[str, None] = {}
+            i = bisect_left(price_starts, lo)
+            while i < len(price_spans) and len(prices) < 2:
+                _, price_end, p = price_spans[i]
+                if price_end > hi:
+                    break
+                cleaned_p = self._clean_text(p)
+                if cleaned_p:
+                    prices[cleaned_p] = None
+                i += 1
+            prices = list(prices)
 
             # Ссылка
             link = f"https://www.ozon.ru/product/-{pid}/"
@@ -463,31 +661,78 @@ class OzonHTMLParser:
                 'link': link
             }
 
-        # Конвертируем в ProductInfo
+        products = self._items_to_products(items)
+
+        logger.debug(f"Fallback: найдено {len(products)} товаров (исключая рекомендации)")
+        return products
+
+    def _collect_prices(self, container, get_text) -> List[str]:
+        """
+        Собирает до двух уникальных цен из текста родителей ссылки.
+
+        Родители просматриваются от ближайшего (не выше 4 уровней).
+        Более далекий предок может только дописать цены в конец списка,
+        поэтому обход прекращается, как только найдены две цены.
+
+        Args:
+            container: Ближайший родитель ссылки
+            get_text: Функция получения текста узла
+
+        Returns:
+            Список цен (не более двух)
+        """
+        prices: Dict[str, None] = {}
+        for _ in range(4):
+            if container is None:
+                break
+            for p in self.RE_PRICE.findall(get_text(container)):
+                cleaned_p = self._clean_text(p)
+                if cleaned_p:
+                    prices[cleaned_p] = None
+            if len(prices) >= 2:
+                break
+            container = container.parent
+        return list(prices)[:2]
+
+    @staticmethod
+    def _find_spans(pattern, html: str, group: int) -> List[Tuple[int, int, str]]:
+        """
+        Находит все совпадения шаблона в HTML.
+
+        Args:
+            pattern: Скомпилированный шаблон
+            html: HTML страницы
+            group: Номер группы, текст которой нужен
+
+        Returns:
+            Список (начало, конец, текст группы), упорядоченный по началу
+        """
+        return [(m.start(), m.end(), m.group(group)) for m in pattern.finditer(html)]
+
+    @staticmethod
+    def _first_in_window(spans: List[Tuple[int, int, str]], lo: int, hi: int) -> Optional[str]:
+        """Возвращает текст первого совпадения, целиком лежащего в [lo, hi)"""
+        i = bisect_left(spans, (lo,))
+        if i < len(spans) and spans[i][1] <= hi:
+            return spans[i][2]
+        return None
+
+    @staticmethod
+    def _items_to_products(items: Dict[str, dict]) -> List[ProductInfo]:
+        """Конвертирует найденные товары в ProductInfo"""
         products = []
-        for pid, data in items.items():
+        for data in items.values():
             prices = data['prices']
-            product = ProductInfo(
+            products.append(ProductInfo(
                 sku=data['sku'],
                 name=data['name'],
                 current_price=prices[0] if len(prices) > 0 else '',
                 original_price=prices[1] if len(prices) > 1 else '',
                 link=data['link']
-            )
-            products.append(product)
-
-        logger.debug(f"Fallback: найдено {len(products)} товаров (исключая рекомендации)")
+            ))
         return products
 
-    @staticmethod
-    def _clean_text(s: str) -> str:
-        """Очищает текст от лишних символов"""
-        if not s:
-            return ''
-        s = s.strip()
-        s = re.sub(r'[\u00A0\u2009\u202F]+', ' ', s)
-        s = re.sub(r'\s+', ' ', s)
-        return s
+    _clean_text = staticmethod(clean_text)
 
     def get_products(self) -> List[ProductInfo]:
         """Возвращает список спарсенных товаров"""
@@ -2,23 +2,77 @@
 Экспорт данных в различные форматы
 """
 
+import json
 import logging
+import re
+from itertools import chain
+from operator import attrgetter
 from pathlib import Path
-from typing import List
+from typing import List, Sequence, Tuple
 from xml.etree import ElementTree as ET
 from datetime import datetime
 
 try:
     from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
     from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
     HAS_OPENPYXL = True
 except ImportError:
     HAS_OPENPYXL = False
 
+try:
+    from lxml import etree as LET
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 from src.parsers.api_parser import ProductInfo
 
 logger = logging.getLogger(__name__)
 
+# Поля ProductInfo в порядке столбцов Excel
+EXCEL_FIELDS = (
+    'sku',
+    'name',
+    'current_price',
+    'original_price',
+    'rating',
+    'reviews_count',
+    'seller_name',
+    'seller_inn',
+    'brand',
+    'category',
+    'link',
+    'image_url',
+)
+
+# Заголовки столбцов Excel (соответствуют EXCEL_FIELDS)
+EXCEL_HEADERS = (
+    'SKU',
+    'Название',
+    'Текущая цена',
+    'Старая цена',
+    'Рейтинг',
+    'Отзывов',
+    'Продавец',
+    'ИНН',
+    'Бренд',
+    'Категория',
+    'Ссылка',
+    'Изображение',
+)
+
+# Символы, недопустимые в XML 1.0 (управляющие и т.п.): lxml отказывается
+# их записывать, а ElementTree записывает некорректный XML
+RE_XML_INVALID_CHARS = re.compile('[^\t\n\r\u0020-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]')
+
 
 class DataExporter:
     """Экспорт данных в различные форматы"""
@@ -40,52 +94,23 @@ class DataExporter:
             return False
 
         try:
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Товары"
-
-            # Заголовки
-            headers = [
-                'SKU',
-                'Название',
-                'Текущая цена',
-                'Старая цена',
-                'Рейтинг',
-                'Отзывов',
-                'Продавец',
-                'ИНН',
-                'Бренд',
-                'Категория',
-                'Ссылка',
-                'Изображение'
-            ]
-
-            ws.append(headers)
-
-            # Стилизация заголовков
-            DataExporter._style_header_row(ws)
+            # write_only: строки сразу пишутся в файл, а не хранятся как объекты Cell
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet("Товары")
+
+            rows = DataExporter.to_records(products, EXCEL_FIELDS)
+
+            # Ширину столбцов нужно задать до первой строки
+            DataExporter._set_column_widths(ws, EXCEL_HEADERS, rows)
+
+            # Заголовки (высота строки задается до ее записи)
+            ws.row_dimensions[1].height = 30
+            ws.append(DataExporter._styled_header_cells(ws, EXCEL_HEADERS))
 
             # Данные
-            for product in products:
-                row = [
-                    product.sku,
-                    product.name,
-                    product.current_price,
-                    product.original_price,
-                    product.rating,
-                    product.reviews_count,
-                    product.seller_name,
-                    product.seller_inn,
-                    product.brand,
-                    product.category,
-                    product.link,
-                    product.image_url,
-                ]
+            for row in rows:
                 ws.append(row)
 
-            # Автоширина столбцов
-            DataExporter._auto_width_columns(ws)
-
             # Сохранение
             wb.save(filename)
             logger.info(f"Excel файл сохранен: {filename}")
@@ -96,8 +121,22 @@ class DataExporter:
             return False
 
     @staticmethod
-    def _style_header_row(ws):
-        """Применяет стили к заголовкам"""
+    def to_records(products: List[ProductInfo], fields: Sequence[str]) -> List[Tuple]:
+        """
+        Преобразует товары в список кортежей за один проход.
+
+        Args:
+            products: Список товаров
+            fields: Имена полей ProductInfo в нужном порядке
+
+        Returns:
+            Список кортежей значений полей
+        """
+        return list(map(attrgetter(*fields), products))
+
+    @staticmethod
+    def _styled_header_cells(ws, headers: Sequence[str]) -> List:
+        """Создает ячейки заголовков со стилями"""
         header_font = Font(bold=True, color="FFFFFF", size=11)
         header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
         header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
@@ -108,34 +147,30 @@ class DataExporter:
             bottom=Side(style='thin')
         )
 
-        for cell in ws[1]:
+        cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
             cell.font = header_font
             cell.fill = header_fill
             cell.alignment = header_alignment
             cell.border = border
-
-        # Высота строки заголовков
-        ws.row_dimensions[1].height = 30
+            cells.append(cell)
+        return cells
 
     @staticmethod
-    def _auto_width_columns(ws):
-        """Автоматически подбирает ширину столбцов"""
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-
-            for cell in column:
-                try:
-                    if cell.value:
-                        cell_length = len(str(cell.value))
-                        if cell_length > max_length:
-                            max_length = cell_length
-                except:
-                    pass
-
+    def _set_column_widths(ws, headers: Sequence[str], rows: List[Tuple]):
+        """Подбирает ширину столбцов по самому длинному значению"""
+        max_lengths = [0] * len(headers)
+        for row in chain((headers,), rows):
+            for i, value in enumerate(row):
+                if value:
+                    length = len(str(value))
+                    if length > max_lengths[i]:
+                        max_lengths[i] = length
+
+        for i, max_length in enumerate(max_lengths, start=1):
             # Ограничиваем ширину
-            adjusted_width = min(max_length + 2, 60)
-            ws.column_dimensions[column_letter].width = adjusted_width
+            ws.column_dimensions[get_column_letter(i)].width = min(max_length + 2, 60)
 
     @staticmethod
     def export_to_xml(products: List[ProductInfo], filename: Path) -> bool:
@@ -149,26 +184,32 @@ class DataExporter:
         Returns:
             True если успешно, False если ошибка
         """
+        # lxml строит дерево и форматирует отступы на стороне C (libxml2)
+        etree = LET if HAS_LXML else ET
+
         try:
-            root = ET.Element('products')
+            root = etree.Element('products')
             root.set('count', str(len(products)))
             root.set('exported_at', datetime.now().isoformat())
 
             for product in products:
-                item_elem = ET.SubElement(root, 'product')
+                item_elem = etree.SubElement(root, 'product')
 
                 # Добавляем все поля
                 for field, value in product.to_dict().items():
                     if field not in ['success', 'error']:  # Пропускаем служебные поля
-                        elem = ET.SubElement(item_elem, field)
-                        elem.text = str(value) if value else ''
-
-            # Форматирование XML
-            DataExporter._indent_xml(root)
-
-            # Сохранение
-            tree = ET.ElementTree(root)
-            tree.write(filename, encoding='utf-8', xml_declaration=True)
+                        elem = etree.SubElement(item_elem, field)
+                        elem.text = RE_XML_INVALID_CHARS.sub('', str(value)) if value else ''
+
+            # Форматирование и сохранение
+            if HAS_LXML:
+                Path(filename).write_bytes(
+                    LET.tostring(root, pretty_print=True, xml_declaration=True, encoding='utf-8')
+                )
+            else:
+                DataExporter._indent_xml(root)
+                tree = ET.ElementTree(root)
+                tree.write(filename, encoding='utf-8', xml_declaration=True)
 
             logger.info(f"XML файл сохранен: {filename}")
             return True
@@ -204,8 +245,6 @@ class DataExporter:
         Returns:
             True если успешно, False если ошибка
         """
-        import json
-
         try:
             data = {
                 'count': len(products),
@@ -213,8 +252,12 @@ class DataExporter:
                 'products': [p.to_dict() for p in products]
             }
 
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            if HAS_ORJSON:
+                # orjson пишет UTF-8 без экранирования, как ensure_ascii=False
+                Path(filename).write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            else:
+                with open(filename, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
 
             logger.info(f"JSON файл сохранен: {filename}")
             return True
@@ -0,0 +1,51 @@
+"""
+Компиляция горячих регулярных выражений через re2
+"""
+
+import logging
+import re
+
+# re2 (DFA, линейное время без бэктрекинга) для горячих регулярок, если установлен
+try:
+    import re2
+    HAS_RE2 = True
+except ImportError:
+    HAS_RE2 = False
+
+logger = logging.getLogger(__name__)
+
+# Флаги re, которые синтаксис re2 поддерживает как встроенные (?flags).
+# re.UNICODE для строковых шаблонов включен в обоих движках по умолчанию
+RE2_INLINE_FLAGS = {
+    re.IGNORECASE: 'i',
+    re.MULTILINE: 'm',
+    re.DOTALL: 's',
+}
+
+
+def compile_fast(pattern: str, flags: int = 0):
+    """
+    Компилирует регулярное выражение через re2, если он доступен
+    и поддерживает шаблон, иначе через стандартный re.
+
+    Флаги re передаются в re2 встроенными модификаторами ((?i) и т.п.):
+    вторым аргументом re2.compile ожидает объект re2.Options, а не флаги re.
+
+    Args:
+        pattern: Шаблон регулярного выражения
+        flags: Флаги re
+
+    Returns:
+        Скомпилированный шаблон с API, совместимым с re.Pattern
+    """
+    if HAS_RE2:
+        inline = ''.join(char for flag, char in RE2_INLINE_FLAGS.items() if flags & flag)
+        other_flags = flags & ~(re.IGNORECASE | re.MULTILINE | re.DOTALL | re.UNICODE)
+        if other_flags:
+            logger.debug(f"re2: флаги {other_flags} не поддерживаются, используется re: {pattern!r}")
+        else:
+            try:
+                return re2.compile(f'(?{inline}){pattern}' if inline else pattern)
+            except (re2.error, TypeError) as e:
+                logger.debug(f"re2 не поддерживает шаблон, используется re: {pattern!r} ({e})")
+    return re.compile(pattern, flags)
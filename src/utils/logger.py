@@ -2,16 +2,24 @@
 Настройка логирования
 """
 
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 from src.config.settings import Settings
 
+# Фоновый поток, который пишет записи лога в файл и консоль
+_queue_listener = None
+
 
 def setup_logger(name: str = 'ozon_parser', log_file: Path = None) -> logging.Logger:
     """
     Настраивает логгер с ротацией файлов.
 
+    Потоки парсера только кладут записи в очередь, а запись в файл
+    и консоль выполняет отдельный поток QueueListener.
+
     Args:
         name: Имя логгера
         log_file: Путь к файлу лога (по умолчанию из Settings)
@@ -43,12 +51,25 @@ def setup_logger(name: str = 'ozon_parser', log_file: Path = None) -> logging.Lo
     console_handler.setFormatter(formatter)
     console_handler.setLevel(logging.INFO)  # INFO уровень для консоли
 
+    # Перенастройка: останавливаем предыдущий поток записи
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+    else:
+        # При выходе дописываем оставшиеся в очереди записи
+        atexit.register(lambda: _queue_listener.stop())
+
+    log_queue = queue.Queue(-1)
+    _queue_listener = QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    _queue_listener.start()
+
     # Настройка корневого логгера для всех модулей
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, Settings.LOG_LEVEL))
     root_logger.handlers.clear()
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
+    root_logger.addHandler(QueueHandler(log_queue))
 
     # Настройка основного логгера приложения
     logger = logging.getLogger(name)
@@ -0,0 +1,92 @@
+"""
+Проверки и разбор содержимого страниц, загруженных браузером
+"""
+
+import re
+from typing import Optional
+
+# Индикаторы блокировки (более специфичные паттерны)
+BLOCK_PATTERNS = (
+    "cloudflare",
+    "ddos-guard",
+    "доступ ограничен",
+    "access denied",
+    "checking your browser",
+    "just a moment",
+    "captcha",
+    "подтвердите, что вы не робот",
+    "are you a robot",
+    "verify you are human",
+    "bot detected",
+    "security check",
+    "проверка безопасности",
+)
+
+# Все индикаторы одной альтернацией: страница просматривается один раз,
+# а не отдельным поиском подстроки на каждый паттерн.
+# IGNORECASE вместо .lower(): не создается копия просматриваемого фрагмента
+RE_BLOCK_PATTERNS = re.compile('|'.join(map(re.escape, BLOCK_PATTERNS)), re.IGNORECASE)
+
+# Страницы блокировки выдают себя в <head>/<title> или в подвале,
+# поэтому просматриваются только начало и конец HTML
+BLOCK_SCAN_HEAD = 16384
+BLOCK_SCAN_TAIL = 8192
+
+# Фигурные скобки: баланс считается только по их позициям, а не по каждому символу
+RE_BRACE = re.compile(r'[{}]')
+
+# Начало JSON-объекта с ключом: в <pre>, в начале документа или строки.
+# Пропускает фигурные скобки из <script> и <style>, стоящих раньше ответа API
+RE_JSON_START = re.compile(r'(?:<pre[^>]*>|^|\n)\s*(\{"[^"]{1,64}":)')
+
+
+def find_block_indicator(content: str) -> Optional[str]:
+    """
+    Ищет на странице признаки блокировки.
+
+    Просматриваются первые BLOCK_SCAN_HEAD и последние BLOCK_SCAN_TAIL
+    символов, а не весь HTML.
+
+    Args:
+        content: HTML страницы
+
+    Returns:
+        Первый найденный индикатор блокировки или None
+    """
+    match = RE_BLOCK_PATTERNS.search(content, 0, BLOCK_SCAN_HEAD)
+    if not match and len(content) > BLOCK_SCAN_HEAD:
+        tail_start = max(BLOCK_SCAN_HEAD, len(content) - BLOCK_SCAN_TAIL)
+        match = RE_BLOCK_PATTERNS.search(content, tail_start)
+    return match.group().lower() if match else None
+
+
+def extract_json_object(content: str) -> Optional[str]:
+    """
+    Вырезает из HTML первый JSON-объект по балансу фигурных скобок.
+
+    Скобки находит регулярное выражение на стороне C, поэтому цикл Python
+    проходит только по скобкам, а не по каждому символу страницы.
+    Если на странице есть характерное начало объекта ({"ключ": в <pre>
+    или с начала строки), разбор начинается с него, иначе - с первой скобки.
+
+    Args:
+        content: HTML страницы
+
+    Returns:
+        Текст JSON-объекта или None, если сбалансированный объект не найден
+    """
+    match = RE_JSON_START.search(content)
+    start = match.start(1) if match else content.find('{')
+    if start == -1:
+        return None
+
+    depth = 0
+    for match in RE_BRACE.finditer(content, start):
+        if match.group() == '{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return content[start:match.end()]
+
+    return None
@@ -2,9 +2,8 @@
 Управление Playwright для обхода анти-бот защиты
 """
 
-import time
 import logging
-from typing import Optional
+from typing import List, Optional
 
 try:
     from playwright.sync_api import sync_playwright, Browser, Page, TimeoutError as PlaywrightTimeout
@@ -15,9 +14,78 @@ except ImportError:
     Page = None
 
 from src.config.settings import Settings
+from src.utils.page_checks import extract_json_object, find_block_indicator
 
 logger = logging.getLogger(__name__)
 
+# Комплексный анти-детект скрипт из best practices
+ANTI_DETECT_JS = """
+    // Скрываем webdriver
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+
+    // Эмулируем Chrome runtime
+    window.chrome = {
+        runtime: {},
+        loadTimes: function() {},
+        csi: function() {},
+        app: {}
+    };
+
+    // Добавляем реалистичные плагины
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [
+            { name: 'Chrome PDF Plugin', filename: 'internal-pdf-viewer' },
+            { name: 'Chrome PDF Viewer', filename: 'mhjfbmdgcfjbbpaeojofohoefgiehjai' },
+            { name: 'Native Client', filename: 'internal-nacl-plugin' }
+        ]
+    });
+
+    // Эмулируем languages
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['ru-RU', 'ru', 'en-US', 'en']
+    });
+
+    // Переопределяем permissions
+    const originalQuery = window.navigator.permissions.query;
+    window.navigator.permissions.query = (parameters) => (
+        parameters.name === 'notifications' ?
+            Promise.resolve({ state: Notification.permission }) :
+            originalQuery(parameters)
+    );
+
+    // Маскируем headless mode
+    Object.defineProperty(navigator, 'platform', {
+        get: () => 'Linux armv8l'  // Android platform
+    });
+
+    // Добавляем battery API для мобильных устройств
+    if (!navigator.getBattery) {
+        navigator.getBattery = () => Promise.resolve({
+            charging: true,
+            chargingTime: 0,
+            dischargingTime: Infinity,
+            level: 0.85
+        });
+    }
+"""
+
+# Типы ресурсов, не нужные для получения JSON ответа API.
+# Стили не блокируются: от них зависят некоторые анти-бот проверки
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'font', 'media'})
+
+# Счетчики и трекеры
+BLOCKED_TRACKER_DOMAINS = (
+    'google-analytics.com',
+    'googletagmanager.com',
+    'doubleclick.net',
+    'mc.yandex.ru',
+)
+
+# Текст ответа API из <pre> одним вызовом (textContent не требует layout)
+PRE_TEXT_JS = "() => { const pre = document.querySelector('pre'); return pre ? pre.textContent : null; }"
+
 
 class PlaywrightManager:
     """
@@ -30,13 +98,23 @@ class PlaywrightManager:
         self.browser: Optional[Browser] = None
         self.page: Optional[Page] = None
         self.context = None
-
-    def create_browser(self, headless: bool = True) -> Page:
+        # Ответ API отображается браузером в теге <pre>
+        self.default_wait_selector: Optional[str] = 'pre'
+        # HTML текущей страницы (сбрасывается при каждом переходе)
+        self.content_cache: Optional[str] = None
+        # Ответ сервера на последний переход (page.goto)
+        self.response = None
+
+    def create_browser(self, headless: bool = True, block_resources: bool = True) -> Page:
         """
         Создает браузер Playwright с анти-детект настройками.
 
+        Если браузер уже запущен, возвращает его текущую страницу:
+        последующие переходы выполняются в той же вкладке.
+
         Args:
             headless: Запускать в headless режиме
+            block_resources: Не загружать картинки, шрифты, медиа и трекеры
 
         Returns:
             Настроенная страница (Page)
@@ -49,6 +127,10 @@ class PlaywrightManager:
                 "Playwright не установлен. Установите: pip install playwright && playwright install chromium"
             )
 
+        if self.page and not self.page.is_closed() and self.browser.is_connected():
+            logger.debug("Playwright: используется уже запущенный браузер")
+            return self.page
+
         try:
             # Запуск Playwright
             self.playwright = sync_playwright().start()
@@ -86,12 +168,15 @@ class PlaywrightManager:
                 }
             )
 
-            # Создание страницы
-            self.page = self.context.new_page()
+            if block_resources:
+                self.context.route('**/*', self._filter_request)
 
-            # Применяем дополнительные анти-детект скрипты
+            # Применяем дополнительные анти-детект скрипты до создания страницы
             self._apply_anti_detect_scripts()
 
+            # Создание страницы
+            self.page = self.context.new_page()
+
             logger.info("Создан Playwright браузер")
             return self.page
 
@@ -100,72 +185,42 @@ class PlaywrightManager:
             self.close()
             raise
 
+    @staticmethod
+    def _filter_request(route):
+        """Отменяет загрузку ненужных ресурсов, остальные запросы пропускает"""
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or any(
+            domain in request.url for domain in BLOCKED_TRACKER_DOMAINS
+        ):
+            route.abort()
+        else:
+            route.continue_()
+
     def _apply_anti_detect_scripts(self):
-        """Применяет JavaScript скрипты для обхода детекции"""
-        if not self.page:
+        """
+        Применяет JavaScript скрипты для обхода детекции.
+
+        Скрипт регистрируется на контексте: его наследуют все страницы контекста.
+        """
+        if not self.context:
             return
 
-        # Комплексный анти-детект скрипт из best practices
-        self.page.add_init_script("""
-            // Скрываем webdriver
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-
-            // Эмулируем Chrome runtime
-            window.chrome = {
-                runtime: {},
-                loadTimes: function() {},
-                csi: function() {},
-                app: {}
-            };
-
-            // Добавляем реалистичные плагины
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [
-                    { name: 'Chrome PDF Plugin', filename: 'internal-pdf-viewer' },
-                    { name: 'Chrome PDF Viewer', filename: 'mhjfbmdgcfjbbpaeojofohoefgiehjai' },
-                    { name: 'Native Client', filename: 'internal-nacl-plugin' }
-                ]
-            });
-
-            // Эмулируем languages
-            Object.defineProperty(navigator, 'languages', {
-                get: () => ['ru-RU', 'ru', 'en-US', 'en']
-            });
-
-            // Переопределяем permissions
-            const originalQuery = window.navigator.permissions.query;
-            window.navigator.permissions.query = (parameters) => (
-                parameters.name === 'notifications' ?
-                    Promise.resolve({ state: Notification.permission }) :
-                    originalQuery(parameters)
-            );
-
-            // Маскируем headless mode
-            Object.defineProperty(navigator, 'platform', {
-                get: () => 'Linux armv8l'  // Android platform
-            });
-
-            // Добавляем battery API для мобильных устройств
-            if (!navigator.getBattery) {
-                navigator.getBattery = () => Promise.resolve({
-                    charging: true,
-                    chargingTime: 0,
-                    dischargingTime: Infinity,
-                    level: 0.85
-                });
-            }
-        """)
-
-    def navigate_to_url(self, url: str, wait_for_load: bool = True, timeout: int = None) -> bool:
+        self.context.add_init_script(ANTI_DETECT_JS)
+
+    def navigate_to_url(self, url: str, wait_for_load: bool = True, timeout: int = None,
+                        wait_selector: Optional[str] = None) -> bool:
         """
         Переходит по URL с обработкой ошибок.
 
+        networkidle не используется: на страницах с аналитикой и long-polling
+        он может не наступить до самого таймаута.
+
         Args:
             url: URL для перехода
-            wait_for_load: Ждать полной загрузки страницы
+            wait_for_load: Ждать появления контента страницы
             timeout: Таймаут в миллисекундах
+            wait_selector: CSS-селектор, появления которого нужно дождаться
+                (по умолчанию default_wait_selector)
 
         Returns:
             True если успешно, False если ошибка
@@ -176,18 +231,27 @@ class PlaywrightManager:
         if timeout is None:
             timeout = Settings.PAGE_LOAD_TIMEOUT * 1000  # Convert to ms
 
+        self.content_cache = None
+        self.response = None
+
         try:
             logger.info(f"Playwright: Переход по URL: {url}")
 
             # Переход с увеличенным таймаутом
-            self.page.goto(url, wait_until='domcontentloaded', timeout=timeout)
+            self.response = self.page.goto(url, wait_until='domcontentloaded', timeout=timeout)
 
             if wait_for_load:
-                # Дополнительное ожидание для загрузки динамического контента
-                time.sleep(3)
-
-                # Ждем загрузки сетевых запросов
-                self.page.wait_for_load_state('networkidle', timeout=timeout)
+                selector = wait_selector or self.default_wait_selector
+                if selector:
+                    # Ждем нужный элемент; если не появился, решает проверка блокировки.
+                    # Ожидание ограничено, чтобы страница блокировки не держала весь таймаут
+                    selector_timeout = min(timeout, 10000)
+                    try:
+                        self.page.wait_for_selector(selector, state='attached', timeout=selector_timeout)
+                    except PlaywrightTimeout:
+                        logger.debug(f"Playwright: элемент {selector} не появился за {selector_timeout} мс")
+                else:
+                    self.page.wait_for_load_state('load', timeout=min(timeout, 5000))
 
             return not self.is_page_blocked()
 
@@ -209,41 +273,35 @@ class PlaywrightManager:
             return False
 
         try:
-            content = self.page.content().lower()
-
-            # Индикаторы блокировки (более специфичные паттерны)
-            block_patterns = [
-                "cloudflare",
-                "ddos-guard",
-                "доступ ограничен",
-                "access denied",
-                "checking your browser",
-                "just a moment",
-                "captcha",
-                "подтвердите, что вы не робот",
-                "are you a robot",
-                "verify you are human",
-                "bot detected",
-                "security check",
-                "проверка безопасности",
-            ]
-
-            for pattern in block_patterns:
-                if pattern in content:
-                    logger.warning(f"Playwright: Обнаружен индикатор блокировки: {pattern}")
-                    return True
-
-            # Проверка на пустую страницу
+            content = self._get_content()
+
+            # Проверка на пустую страницу (до поиска индикаторов)
             if len(content) < 1000:
                 logger.warning("Playwright: Страница слишком короткая")
                 return True
 
+            pattern = find_block_indicator(content)
+            if pattern:
+                logger.warning(f"Playwright: Обнаружен индикатор блокировки: {pattern}")
+                return True
+
             return False
 
         except Exception as e:
             logger.error(f"Ошибка проверки блокировки: {e}")
             return True
 
+    def _get_content(self) -> str:
+        """
+        Возвращает HTML текущей страницы.
+
+        page.content() сериализует весь DOM и передает его через CDP,
+        поэтому результат запоминается до следующего перехода.
+        """
+        if self.content_cache is None:
+            self.content_cache = self.page.content()
+        return self.content_cache
+
     def extract_json_from_page(self) -> Optional[str]:
         """
         Извлекает JSON из страницы API.
@@ -255,9 +313,15 @@ class PlaywrightManager:
             return None
 
         try:
+            # Метод 0: Тело JSON ответа без разбора DOM
+            json_text = self._get_json_response()
+            if json_text:
+                logger.debug("Playwright: JSON извлечен из ответа сервера")
+                return json_text
+
             # Метод 1: Из <pre> тега
             try:
-                pre_content = self.page.locator('pre').first.inner_text()
+                pre_content = self.page.evaluate(PRE_TEXT_JS)
                 if pre_content and len(pre_content) > 10:
                     logger.debug("Playwright: JSON извлечен из <pre> тега")
                     return pre_content
@@ -265,20 +329,10 @@ class PlaywrightManager:
                 pass
 
             # Метод 2: Из page content
-            content = self.page.content()
-            start = content.find('{')
-
-            if start != -1:
-                brace_count = 0
-                for i, char in enumerate(content[start:], start):
-                    if char == '{':
-                        brace_count += 1
-                    elif char == '}':
-                        brace_count -= 1
-                        if brace_count == 0:
-                            json_text = content[start:i+1]
-                            logger.debug("Playwright: JSON извлечен из content")
-                            return json_text
+            json_text = extract_json_object(self._get_content())
+            if json_text:
+                logger.debug("Playwright: JSON извлечен из content")
+                return json_text
 
             logger.warning("Playwright: JSON не найден на странице")
             return None
@@ -287,13 +341,56 @@ class PlaywrightManager:
             logger.error(f"Ошибка извлечения JSON: {e}")
             return None
 
+    def _get_json_response(self) -> Optional[str]:
+        """
+        Возвращает тело ответа на последний переход, если это JSON.
+
+        Ответ не используется, если после него страница ушла на другой URL
+        (например, после проверки CloudFlare).
+
+        Returns:
+            Текст ответа или None
+        """
+        response = self.response
+        if not response or not response.ok or response.url != self.page.url:
+            return None
+
+        if 'json' not in response.headers.get('content-type', ''):
+            return None
+
+        try:
+            return response.text()
+        except Exception as e:
+            logger.debug(f"Playwright: не удалось прочитать тело ответа: {e}")
+            return None
+
     def wait_for_timeout(self, seconds: float):
         """Ожидание в секундах"""
         if self.page:
             self.page.wait_for_timeout(seconds * 1000)
+            # За время ожидания страница могла измениться (например, пройдена проверка)
+            self.content_cache = None
+
+    def get_cookies(self) -> List[dict]:
+        """
+        Возвращает cookies текущего контекста браузера.
+
+        Returns:
+            Список cookies (name, value, domain, path) или пустой список
+        """
+        if not self.context:
+            return []
+
+        try:
+            return self.context.cookies()
+        except Exception as e:
+            logger.error(f"Ошибка получения cookies: {e}")
+            return []
 
     def close(self):
         """Закрывает браузер Playwright"""
+        self.content_cache = None
+        self.response = None
         try:
             if self.page:
                 self.page.close()
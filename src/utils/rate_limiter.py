@@ -0,0 +1,43 @@
+"""
+Ограничение частоты HTTP-запросов
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Потокобезопасный token bucket.
+
+    Общий для всех потоков бюджет запросов: не более rate запросов в секунду
+    в среднем, с допустимым всплеском до burst запросов подряд.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: Средняя частота запросов (в секунду)
+            burst: Сколько запросов можно выполнить подряд без ожидания
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Ждет, пока в бюджете не появится свободный запрос, и занимает его"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
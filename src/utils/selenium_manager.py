@@ -4,12 +4,11 @@
 
 import time
 import logging
-from typing import Optional
+from typing import List, Optional
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
 from selenium.common.exceptions import TimeoutException, WebDriverException
 
 try:
@@ -26,9 +25,31 @@ except ImportError:
     Chrome = webdriver.Chrome
 
 from src.config.settings import Settings
+from src.utils.page_checks import extract_json_object, find_block_indicator
 
 logger = logging.getLogger(__name__)
 
+# Анти-детект скрипт для всех страниц драйвера.
+# Обернут в функцию, чтобы его переменные не попадали в глобальную область страницы
+ANTI_DETECT_JS = """
+(() => {
+    // Убираем navigator.webdriver
+    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+
+    // Уведомления: состояние permissions согласуется с Notification.permission,
+    // остальные запросы идут в настоящий permissions.query
+    const originalQuery = window.navigator.permissions.query;
+    window.navigator.permissions.query = (parameters) => (
+        parameters.name === 'notifications' ?
+            Promise.resolve({ state: Notification.permission }) :
+            originalQuery.call(window.navigator.permissions, parameters)
+    );
+})();
+"""
+
+# Текст ответа API из <pre> одним вызовом (textContent не требует layout)
+PRE_TEXT_JS = "const pre = document.querySelector('pre'); return pre ? pre.textContent : null;"
+
 
 class SeleniumManager:
     """
@@ -38,6 +59,8 @@ class SeleniumManager:
 
     def __init__(self):
         self.driver: Optional[webdriver.Chrome] = None
+        # HTML текущей страницы (сбрасывается при каждом переходе)
+        self.page_source_cache: Optional[str] = None
 
     def create_driver(self, headless: bool = True) -> webdriver.Chrome:
         """
@@ -104,6 +127,11 @@ class SeleniumManager:
         options.add_argument("--disable-extensions")
         # Не используем --single-process так как это вызывает ERR_TUNNEL_CONNECTION_FAILED
 
+        # Ответ API - JSON в <pre>: картинки, шрифты и фоновые сервисы не нужны
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--disable-remote-fonts")
+        options.add_argument("--disable-features=Translate,OptimizationHints,MediaRouter")
+
         # Используем мобильный User-Agent для обхода CloudFlare
         options.add_argument(f"--user-agent={Settings.USER_AGENT_MOBILE}")
         options.add_argument("--log-level=3")
@@ -142,26 +170,9 @@ class SeleniumManager:
         Args:
             driver: WebDriver
         """
-        # Убираем navigator.webdriver
-        driver.execute_script(
-            "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
-        )
-
-        # Переопределяем permissions
-        driver.execute_script("""
-            Object.defineProperty(navigator, 'permissions', {
-                get: () => ({
-                    query: () => Promise.resolve({state: 'granted'})
-                })
-            });
-        """)
-
-        # Переопределяем plugins
-        driver.execute_script("""
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [1, 2, 3, 4, 5]
-            });
-        """)
+        # Один CDP-вызов: скрипт выполняется до скриптов каждой новой страницы,
+        # а не только на текущей (about:blank сразу после запуска)
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': ANTI_DETECT_JS})
 
     def navigate_to_url(self, url: str, wait_for_load: bool = True) -> bool:
         """
@@ -180,6 +191,8 @@ class SeleniumManager:
         if not self.driver:
             raise ValueError("WebDriver не инициализирован. Вызовите create_driver() сначала.")
 
+        self.page_source_cache = None
+
         try:
             logger.info(f"Переход по URL: {url}")
             self.driver.get(url)
@@ -209,6 +222,7 @@ class SeleniumManager:
 
         # Ждем загрузки
         time.sleep(3)
+        self.page_source_cache = None
 
         # Проверяем блокировку один раз
         if self.is_page_blocked():
@@ -229,41 +243,35 @@ class SeleniumManager:
             return False
 
         try:
-            page_source = self.driver.page_source.lower()
-
-            # Индикаторы блокировки (более специфичные паттерны)
-            block_patterns = [
-                "cloudflare",
-                "ddos-guard",
-                "доступ ограничен",
-                "access denied",
-                "checking your browser",
-                "just a moment",
-                "captcha",
-                "подтвердите, что вы не робот",
-                "are you a robot",
-                "verify you are human",
-                "bot detected",
-                "security check",
-                "проверка безопасности",
-            ]
-
-            for pattern in block_patterns:
-                if pattern in page_source:
-                    logger.warning(f"Обнаружен индикатор блокировки: {pattern}")
-                    return True
-
-            # Проверка на пустую страницу
+            page_source = self._get_page_source()
+
+            # Проверка на пустую страницу (до поиска индикаторов)
             if len(page_source) < 1000:
                 logger.warning("Страница слишком короткая (возможно блокировка)")
                 return True
 
+            pattern = find_block_indicator(page_source)
+            if pattern:
+                logger.warning(f"Обнаружен индикатор блокировки: {pattern}")
+                return True
+
             return False
 
         except Exception as e:
             logger.error(f"Ошибка проверки блокировки: {e}")
             return True
 
+    def _get_page_source(self) -> str:
+        """
+        Возвращает HTML текущей страницы.
+
+        page_source сериализует весь DOM и передает его через chromedriver,
+        поэтому результат запоминается до следующего перехода.
+        """
+        if self.page_source_cache is None:
+            self.page_source_cache = self.driver.page_source
+        return self.page_source_cache
+
     def extract_json_from_page(self) -> Optional[str]:
         """
         Извлекает JSON из страницы API.
@@ -277,8 +285,7 @@ class SeleniumManager:
         try:
             # Метод 1: Из <pre> тега (API возвращает JSON в <pre>)
             try:
-                pre_element = self.driver.find_element(By.TAG_NAME, 'pre')
-                json_text = pre_element.text
+                json_text = self.driver.execute_script(PRE_TEXT_JS)
                 if json_text and len(json_text) > 10:
                     logger.debug("JSON извлечен из <pre> тега")
                     return json_text
@@ -286,21 +293,10 @@ class SeleniumManager:
                 pass
 
             # Метод 2: Поиск JSON в page_source
-            page_source = self.driver.page_source
-            start = page_source.find('{')
-
-            if start != -1:
-                # Ищем закрывающую скобку
-                brace_count = 0
-                for i, char in enumerate(page_source[start:], start):
-                    if char == '{':
-                        brace_count += 1
-                    elif char == '}':
-                        brace_count -= 1
-                        if brace_count == 0:
-                            json_text = page_source[start:i+1]
-                            logger.debug("JSON извлечен из page_source")
-                            return json_text
+            json_text = extract_json_object(self._get_page_source())
+            if json_text:
+                logger.debug("JSON извлечен из page_source")
+                return json_text
 
             logger.warning("JSON не найден на странице")
             return None
@@ -309,8 +305,25 @@ class SeleniumManager:
             logger.error(f"Ошибка извлечения JSON: {e}")
             return None
 
+    def get_cookies(self) -> List[dict]:
+        """
+        Возвращает cookies текущей сессии браузера.
+
+        Returns:
+            Список cookies (name, value, domain, path) или пустой список
+        """
+        if not self.driver:
+            return []
+
+        try:
+            return self.driver.get_cookies()
+        except Exception as e:
+            logger.error(f"Ошибка получения cookies: {e}")
+            return []
+
     def close(self):
         """Закрывает WebDriver"""
+        self.page_source_cache = None
         if self.driver:
             try:
                 self.driver.quit()